@@ -1,6 +1,22 @@
+import array
+import bisect
+import codecs
+import collections
+import csv
+import hashlib
+import heapq
+import importlib
 import json
+import mmap
+import re
+import struct
+import sys
+import threading
+import time
 
 class BoundingBox:
+    __slots__ = ('_width', '_height', '_left', '_top')
+
     def __init__(self, width, height, left, top):
         self._width = width
         self._height = height
@@ -27,6 +43,8 @@ class BoundingBox:
         return self._top
 
 class Polygon:
+    __slots__ = ('_x', '_y')
+
     def __init__(self, x, y):
         self._x = x
         self._y = y
@@ -43,38 +61,202 @@ class Polygon:
         return self._y
 
 class Geometry:
-    def __init__(self, geometry):
-        boundingBox = geometry["BoundingBox"]
-        polygon = geometry["Polygon"]
-        bb = BoundingBox(boundingBox["Width"], boundingBox["Height"], boundingBox["Left"], boundingBox["Top"])
-        pgs = []
-        for pg in polygon:
-            pgs.append(Polygon(pg["X"], pg["Y"]))
+    __slots__ = ('_geometry', '_boundingBox', '_polygon')
 
-        self._boundingBox = bb
-        self._polygon = pgs
+    def __init__(self, geometry, polygon=True):
+        self._geometry = geometry
+        self._boundingBox = None
+        self._polygon = None if polygon else []
 
     def __str__(self):
-        s = "BoundingBox: {}\n".format(str(self._boundingBox))
+        s = "BoundingBox: {}\n".format(str(self.boundingBox))
         return s
 
+    def detach(self):
+        if(self._geometry is not None):
+            self.boundingBox
+            self.polygon
+            self._geometry = None
+
     @property
     def boundingBox(self):
+        if(self._boundingBox is None):
+            boundingBox = self._geometry["BoundingBox"]
+            self._boundingBox = BoundingBox(boundingBox["Width"], boundingBox["Height"], boundingBox["Left"], boundingBox["Top"])
         return self._boundingBox
 
     @property
     def polygon(self):
+        if(self._polygon is None):
+            self._polygon = [Polygon(pg["X"], pg["Y"]) for pg in self._geometry["Polygon"]]
         return self._polygon
 
+class ParseStats:
+    __slots__ = ('_timers', '_counters', '_blockTypes', '_textBytes', '_tracer')
+
+    STAGES = {"LINE" : "lines", "TABLE" : "tables", "KEY_VALUE_SET" : "fields"}
+
+    def __init__(self, tracer=None):
+        self._timers = {}
+        self._counters = {}
+        self._blockTypes = {}
+        self._textBytes = 0
+        self._tracer = tracer
+
+    def __str__(self):
+        s = ["Parse stats\n==========\n"]
+        s.extend("{}: {:.6f}s\n".format(k, v) for k, v in sorted(self._timers.items()))
+        s.extend("{}: {}\n".format(k, v) for k, v in sorted(self._counters.items()))
+        s.extend("blocks[{}]: {}\n".format(k, v) for k, v in sorted(self._blockTypes.items()))
+        s.append("textBytes: {}\n".format(self._textBytes))
+        return ''.join(s)
+
+    def addTime(self, stage, seconds, trace=True):
+        self._timers[stage] = self._timers.get(stage, 0.0) + seconds
+        if(trace and self._tracer):
+            self._tracer(stage, seconds)
+
+    def addBlockTime(self, blockType, seconds):
+        self.addTime(self.STAGES.get(blockType, "other"), seconds, trace=False)
+
+    def count(self, name, n=1):
+        self._counters[name] = self._counters.get(name, 0) + n
+
+    def countBlocks(self, blocks):
+        for block in blocks:
+            blockType = block.get('BlockType')
+            self._blockTypes[blockType] = self._blockTypes.get(blockType, 0) + 1
+
+    def addText(self, text):
+        self._textBytes += len(text.encode('utf-8'))
+
+    def asDict(self):
+        return {"timers" : dict(self._timers), "counters" : dict(self._counters),
+                "blockTypes" : dict(self._blockTypes), "textBytes" : self._textBytes}
+
+    @property
+    def timers(self):
+        return self._timers
+
+    @property
+    def counters(self):
+        return self._counters
+
+    @property
+    def blockTypes(self):
+        return self._blockTypes
+
+    @property
+    def textBytes(self):
+        return self._textBytes
+
+class ParseContext:
+    __slots__ = ('_blockMap', '_nodes', '_stats', '_include', '_geometryMode')
+
+    FEATURES = {"LINE" : "LINES", "TABLE" : "TABLES", "KEY_VALUE_SET" : "FORMS"}
+    GEOMETRY_MODES = ("full", "bbox", "none")
+
+    def __init__(self, blockMap, stats=None, include=None, geometry="full"):
+        if(include is not None):
+            include = frozenset(include)
+            unknown = include - set(self.FEATURES.values())
+            if(unknown):
+                raise ValueError("unknown include values: {}".format(", ".join(sorted(unknown))))
+        if(geometry not in self.GEOMETRY_MODES):
+            raise ValueError("geometry must be one of: {}".format(", ".join(self.GEOMETRY_MODES)))
+        self._blockMap = blockMap
+        self._nodes = {}
+        self._stats = stats
+        self._include = include
+        self._geometryMode = geometry
+
+    def includes(self, blockType):
+        return self._include is None or self.FEATURES.get(blockType) in self._include
+
+    def geometry(self, block):
+        if(self._geometryMode == "full"):
+            return Geometry(block['Geometry'])
+        if(self._geometryMode == "bbox"):
+            return Geometry(block['Geometry'], polygon=False)
+        return None
+
+    def node(self, cls, block):
+        node = self._nodes.get(block['Id'])
+        if(node is None):
+            node = cls(block, self._blockMap, self)
+            self._nodes[block['Id']] = node
+            if(self._stats is not None):
+                self._stats.count(cls.__name__)
+        return node
+
+    def getNodeById(self, blockId):
+        return self._nodes.get(blockId)
+
+    def detach(self):
+        self._blockMap = None
+
+    @property
+    def blockMap(self):
+        return self._blockMap
+
+    @property
+    def nodeCount(self):
+        return len(self._nodes)
+
+    @property
+    def stats(self):
+        return self._stats
+
+    @property
+    def include(self):
+        return self._include
+
+    @property
+    def geometryMode(self):
+        return self._geometryMode
+
+def _node(cls, block, blockMap, context):
+    if(context is None):
+        return cls(block, blockMap)
+    return context.node(cls, block)
+
+def _containerBytes(*roots):
+    seen = set()
+    stack = list(roots)
+    total = 0
+    while(stack):
+        item = stack.pop()
+        if(not isinstance(item, (dict, list)) or id(item) in seen):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        stack.extend(item.values() if isinstance(item, dict) else item)
+    return total
+
+def _geometry(block, context):
+    if(context is None):
+        return Geometry(block['Geometry'])
+    return context.geometry(block)
+
+def _boundingBox(node, feature):
+    if(node.geometry is None):
+        raise ValueError("geometry is required for {}, but the document was parsed with geometry=\"none\"".format(feature))
+    return node.geometry.boundingBox
+
 class Word:
-    def __init__(self, block, blockMap):
+    __slots__ = ('_block', '_confidence', '_geometry', '_id', '_text', '_line', '_cell', '_field')
+
+    def __init__(self, block, blockMap, context=None):
         self._block = block
         self._confidence = block['Confidence']
-        self._geometry = Geometry(block['Geometry'])
+        self._geometry = _geometry(block, context)
         self._id = block['Id']
         self._text = ""
         if(block['Text']):
             self._text = block['Text']
+        self._line = None
+        self._cell = None
+        self._field = None
 
     def __str__(self):
         return self._text
@@ -95,16 +277,30 @@ class Word:
     def text(self):
         return self._text
 
+    @property
+    def line(self):
+        return self._line
+
+    @property
+    def cell(self):
+        return self._cell
+
+    @property
+    def field(self):
+        return self._field
+
     @property
     def block(self):
         return self._block
 
 class Line:
-    def __init__(self, block, blockMap):
+    __slots__ = ('_block', '_confidence', '_geometry', '_id', '_text', '_words')
+
+    def __init__(self, block, blockMap, context=None):
 
         self._block = block
         self._confidence = block['Confidence']
-        self._geometry = Geometry(block['Geometry'])
+        self._geometry = _geometry(block, context)
         self._id = block['Id']
 
         self._text = ""
@@ -117,14 +313,13 @@ class Line:
                 if(rs['Type'] == 'CHILD'):
                     for cid in rs['Ids']:
                         if(blockMap[cid]["BlockType"] == "WORD"):
-                            self._words.append(Word(blockMap[cid], blockMap))
+                            w = _node(Word, blockMap[cid], blockMap, context)
+                            w._line = self
+                            self._words.append(w)
     def __str__(self):
-        s = "Line\n==========\n"
-        s = s + self._text + "\n"
-        s = s + "Words\n----------\n"
-        for word in self._words:
-            s = s + "[{}]".format(str(word))
-        return s
+        s = ["Line\n==========\n", self._text, "\n", "Words\n----------\n"]
+        s.extend("[{}]".format(str(word)) for word in self._words)
+        return ''.join(s)
 
     @property
     def confidence(self):
@@ -151,9 +346,11 @@ class Line:
         return self._block
 
 class SelectionElement:
-    def __init__(self, block, blockMap):
+    __slots__ = ('_confidence', '_geometry', '_id', '_selectionStatus')
+
+    def __init__(self, block, blockMap, context=None):
         self._confidence = block['Confidence']
-        self._geometry = Geometry(block['Geometry'])
+        self._geometry = _geometry(block, context)
         self._id = block['Id']
         self._selectionStatus = block['SelectionStatus']
 
@@ -174,10 +371,12 @@ class SelectionElement:
         return self._selectionStatus
 
 class FieldKey:
-    def __init__(self, block, children, blockMap):
+    __slots__ = ('_block', '_confidence', '_geometry', '_id', '_text', '_content')
+
+    def __init__(self, block, children, blockMap, context=None):
         self._block = block
         self._confidence = block['Confidence']
-        self._geometry = Geometry(block['Geometry'])
+        self._geometry = _geometry(block, context)
         self._id = block['Id']
         self._text = ""
         self._content = []
@@ -187,7 +386,7 @@ class FieldKey:
         for eid in children:
             wb = blockMap[eid]
             if(wb['BlockType'] == "WORD"):
-                w = Word(wb, blockMap)
+                w = _node(Word, wb, blockMap, context)
                 self._content.append(w)
                 t.append(w.text)
 
@@ -222,10 +421,12 @@ class FieldKey:
         return self._block
 
 class FieldValue:
-    def __init__(self, block, children, blockMap):
+    __slots__ = ('_block', '_confidence', '_geometry', '_id', '_text', '_content')
+
+    def __init__(self, block, children, blockMap, context=None):
         self._block = block
         self._confidence = block['Confidence']
-        self._geometry = Geometry(block['Geometry'])
+        self._geometry = _geometry(block, context)
         self._id = block['Id']
         self._text = ""
         self._content = []
@@ -235,11 +436,11 @@ class FieldValue:
         for eid in children:
             wb = blockMap[eid]
             if(wb['BlockType'] == "WORD"):
-                w = Word(wb, blockMap)
+                w = _node(Word, wb, blockMap, context)
                 self._content.append(w)
                 t.append(w.text)
             elif(wb['BlockType'] == "SELECTION_ELEMENT"):
-                se = SelectionElement(wb, blockMap)
+                se = _node(SelectionElement, wb, blockMap, context)
                 self._content.append(se)
                 self._text = se.selectionStatus
 
@@ -274,13 +475,15 @@ class FieldValue:
         return self._block
 
 class Field:
-    def __init__(self, block, blockMap):
+    __slots__ = ('_key', '_value')
+
+    def __init__(self, block, blockMap, context=None):
         self._key = None
         self._value = None
 
         for item in block['Relationships']:
             if(item["Type"] == "CHILD"):
-                self._key = FieldKey(block, item['Ids'], blockMap)
+                self._key = FieldKey(block, item['Ids'], blockMap, context)
             elif(item["Type"] == "VALUE"):
                 for eid in item['Ids']:
                     vkvs = blockMap[eid]
@@ -288,7 +491,12 @@ class Field:
                         if('Relationships' in vkvs):
                             for vitem in vkvs['Relationships']:
                                 if(vitem["Type"] == "CHILD"):
-                                    self._value = FieldValue(vkvs, vitem['Ids'], blockMap)
+                                    self._value = FieldValue(vkvs, vitem['Ids'], blockMap, context)
+        for part in (self._key, self._value):
+            if(part):
+                for item in part.content:
+                    if(isinstance(item, Word)):
+                        item._field = self
     def __str__(self):
         s = "\nField\n==========\n"
         k = ""
@@ -308,65 +516,149 @@ class Field:
     def value(self):
         return self._value
 
+class FieldIndex:
+    __slots__ = ('_fields', '_n', '_lowerKeys', '_exact', '_sortedKeys', '_grams', '_gramIndex')
+
+    def __init__(self, fields, n=3):
+        self._fields = [field for field in fields if field.key]
+        self._n = n
+        self._lowerKeys = []
+        self._exact = {}
+        self._grams = []
+        self._gramIndex = {}
+        for i, field in enumerate(self._fields):
+            self._lowerKeys.append(field.key.text.lower())
+            normalized = self.normalizeKey(field.key.text)
+            self._exact.setdefault(normalized, []).append(i)
+            grams = self._ngrams(normalized)
+            self._grams.append(grams)
+            for gram in grams:
+                self._gramIndex.setdefault(gram, []).append(i)
+        self._sortedKeys = sorted((key, i) for key, ids in self._exact.items() for i in ids)
+
+    @staticmethod
+    def normalizeKey(key):
+        return ' '.join(key.lower().split()).rstrip(':').rstrip()
+
+    def _ngrams(self, text):
+        padded = ' ' + text + ' '
+        if(len(padded) < self._n):
+            return {padded}
+        return {padded[i:i + self._n] for i in range(len(padded) - self._n + 1)}
+
+    def exact(self, key):
+        return [self._fields[i] for i in self._exact.get(self.normalizeKey(key), [])]
+
+    def prefix(self, prefix):
+        prefix = self.normalizeKey(prefix)
+        start = bisect.bisect_left(self._sortedKeys, (prefix, -1))
+        ids = []
+        for key, i in self._sortedKeys[start:]:
+            if(not key.startswith(prefix)):
+                break
+            ids.append(i)
+        return [self._fields[i] for i in sorted(ids)]
+
+    def contains(self, key):
+        searchKey = key.lower()
+        return [self._fields[i] for i, k in enumerate(self._lowerKeys) if searchKey in k]
+
+    def fuzzy(self, key, minScore=0.6, limit=None):
+        grams = self._ngrams(self.normalizeKey(key))
+        shared = {}
+        for gram in grams:
+            for i in self._gramIndex.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        results = []
+        for i, count in shared.items():
+            score = 2.0 * count / (len(grams) + len(self._grams[i]))
+            if(score >= minScore):
+                results.append((score, i))
+        results.sort(key=lambda r: (-r[0], r[1]))
+        if(limit is not None):
+            results = results[:limit]
+        return [(self._fields[i], score) for score, i in results]
+
+    @property
+    def fields(self):
+        return self._fields
+
 class Form:
+    __slots__ = ('_fields', '_fieldsMap', '_index')
+
     def __init__(self):
         self._fields = []
         self._fieldsMap = {}
+        self._index = None
 
     def addField(self, field):
         self._fields.append(field)
         self._fieldsMap[field.key.text] = field
+        self._index = None
 
     def __str__(self):
-        s = ""
-        for field in self._fields:
-            s = s + str(field) + "\n"
-        return s
+        return ''.join([str(field) + "\n" for field in self._fields])
 
     @property
     def fields(self):
         return self._fields
 
+    @property
+    def index(self):
+        if(self._index is None):
+            self._index = FieldIndex(self._fields)
+        return self._index
+
     def getFieldByKey(self, key):
         field = None
         if(key in self._fieldsMap):
             field = self._fieldsMap[key]
         return field
-    
+
+    def getFieldsByKey(self, key):
+        return self.index.exact(key)
+
     def searchFieldsByKey(self, key):
-        searchKey = key.lower()
-        results = []
-        for field in self._fields:
-            if(field.key and searchKey in field.key.text.lower()):
-                results.append(field)
-        return results
+        return self.index.contains(key)
+
+    def searchFieldsByKeyPrefix(self, prefix):
+        return self.index.prefix(prefix)
+
+    def searchFieldsByKeyFuzzy(self, key, minScore=0.6, limit=None):
+        return self.index.fuzzy(key, minScore, limit)
 
 class Cell:
 
-    def __init__(self, block, blockMap):
+    __slots__ = ('_block', '_confidence', '_rowIndex', '_columnIndex', '_rowSpan', '_columnSpan', '_geometry', '_id', '_content', '_text',
+                 '_entityTypes')
+
+    def __init__(self, block, blockMap, context=None):
         self._block = block
         self._confidence = block['Confidence']
         self._rowIndex = block['RowIndex']
         self._columnIndex = block['ColumnIndex']
         self._rowSpan = block['RowSpan']
         self._columnSpan = block['ColumnSpan']
-        self._geometry = Geometry(block['Geometry'])
+        self._geometry = _geometry(block, context)
         self._id = block['Id']
+        self._entityTypes = block.get('EntityTypes', ())
         self._content = []
-        self._text = ""
+        t = []
         if('Relationships' in block and block['Relationships']):
             for rs in block['Relationships']:
                 if(rs['Type'] == 'CHILD'):
                     for cid in rs['Ids']:
                         blockType = blockMap[cid]["BlockType"]
                         if(blockType == "WORD"):
-                            w = Word(blockMap[cid], blockMap)
+                            w = _node(Word, blockMap[cid], blockMap, context)
+                            w._cell = self
                             self._content.append(w)
-                            self._text = self._text + w.text + ' '
+                            t.append(w.text + ' ')
                         elif(blockType == "SELECTION_ELEMENT"):
-                            se = SelectionElement(blockMap[cid], blockMap)
+                            se = _node(SelectionElement, blockMap[cid], blockMap, context)
                             self._content.append(se)
-                            self._text = self._text + se.selectionStatus + ', '
+                            t.append(se.selectionStatus + ', ')
+        self._text = ''.join(t)
 
     def __str__(self):
         return self._text
@@ -391,6 +683,14 @@ class Cell:
     def columnSpan(self):
         return self._columnSpan
 
+    @property
+    def entityTypes(self):
+        return self._entityTypes
+
+    @property
+    def cleanText(self):
+        return ' '.join([item.text if isinstance(item, Word) else item.selectionStatus for item in self._content])
+
     @property
     def geometry(self):
         return self._geometry
@@ -412,14 +712,13 @@ class Cell:
         return self._block
 
 class Row:
+    __slots__ = ('_cells',)
+
     def __init__(self):
         self._cells = []
 
     def __str__(self):
-        s = ""
-        for cell in self._cells:
-            s = s + "[{}]".format(str(cell))
-        return s
+        return ''.join(["[{}]".format(str(cell)) for cell in self._cells])
 
     @property
     def cells(self):
@@ -427,15 +726,23 @@ class Row:
 
 class Table:
 
-    def __init__(self, block, blockMap):
+    __slots__ = ('_block', '_confidence', '_geometry', '_id', '_rows', '_rowCount', '_columnCount', '_grid', '_expandedGrid',
+                 '_headerRows')
+
+    MAX_HEADER_ROWS = 3
+
+    def __init__(self, block, blockMap, context=None):
 
         self._block = block
 
         self._confidence = block['Confidence']
-        self._geometry = Geometry(block['Geometry'])
+        self._geometry = _geometry(block, context)
 
         self._id = block['Id']
         self._rows = []
+        self._grid = None
+        self._expandedGrid = None
+        self._headerRows = None
 
         ri = 1
         row = Row()
@@ -444,7 +751,7 @@ class Table:
             for rs in block['Relationships']:
                 if(rs['Type'] == 'CHILD'):
                     for cid in rs['Ids']:
-                        cell = Cell(blockMap[cid], blockMap)
+                        cell = Cell(blockMap[cid], blockMap, context)
                         if(cell.rowIndex > ri):
                             self._rows.append(row)
                             row = Row()
@@ -453,12 +760,19 @@ class Table:
                     if(row and row.cells):
                         self._rows.append(row)
 
+        self._rowCount = 0
+        self._columnCount = 0
+        for row in self._rows:
+            for cell in row.cells:
+                self._rowCount = max(self._rowCount, cell.rowIndex + cell.rowSpan - 1)
+                self._columnCount = max(self._columnCount, cell.columnIndex + cell.columnSpan - 1)
+
     def __str__(self):
-        s = "Table\n==========\n"
+        s = ["Table\n==========\n"]
         for row in self._rows:
-            s = s + "Row\n==========\n"
-            s = s + str(row) + "\n"
-        return s
+            s.append("Row\n==========\n")
+            s.append(str(row) + "\n")
+        return ''.join(s)
 
     @property
     def confidence(self):
@@ -480,77 +794,638 @@ class Table:
     def block(self):
         return self._block
 
+    @property
+    def rowCount(self):
+        return self._rowCount
+
+    @property
+    def columnCount(self):
+        return self._columnCount
+
+    def _buildGrids(self):
+        grid = [[None] * self._columnCount for r in range(self._rowCount)]
+        expanded = [[None] * self._columnCount for r in range(self._rowCount)]
+        for row in self._rows:
+            for cell in row.cells:
+                grid[cell.rowIndex - 1][cell.columnIndex - 1] = cell
+                for r in range(cell.rowIndex - 1, cell.rowIndex - 1 + cell.rowSpan):
+                    for c in range(cell.columnIndex - 1, cell.columnIndex - 1 + cell.columnSpan):
+                        expanded[r][c] = cell
+        self._grid = grid
+        self._expandedGrid = expanded
+
+    def grid(self, expandSpans=False):
+        if(self._grid is None):
+            self._buildGrids()
+        return self._expandedGrid if expandSpans else self._grid
+
+    def cell(self, rowIndex, columnIndex, expandSpans=False):
+        if(rowIndex < 1 or rowIndex > self._rowCount or columnIndex < 1 or columnIndex > self._columnCount):
+            raise IndexError("cell ({}, {}) is outside the {}x{} table".format(rowIndex, columnIndex, self._rowCount, self._columnCount))
+        return self.grid(expandSpans)[rowIndex - 1][columnIndex - 1]
+
+    def column(self, columnIndex, expandSpans=False, skipHeader=False):
+        if(columnIndex < 1 or columnIndex > self._columnCount):
+            raise IndexError("column {} is outside the table".format(columnIndex))
+        start = len(self.headerRows) if skipHeader else 0
+        return [row[columnIndex - 1] for row in self.grid(expandSpans)[start:]]
+
+    def columnPositions(self):
+        positions = []
+        for c in range(1, self._columnCount + 1):
+            lefts = [_boundingBox(cell, "Table.columnPositions").left for cell in self.column(c) if cell and cell.columnSpan == 1]
+            positions.append(sum(lefts) / len(lefts) if lefts else None)
+        return positions
+
+    def toColumns(self, page=0, tableIndex=0):
+        return TableColumns().add(self, page, tableIndex)
+
+    def toArrow(self):
+        return self.toColumns().toArrow()
+
+    def toPandas(self, grid=False):
+        if(not grid):
+            return self.toColumns().toPandas()
+        pandas = TableColumns._import("pandas")
+        headerRows = self.headerRows
+        rows = [[cell.cleanText if cell else "" for cell in row] for row in self.grid(True)[len(headerRows):]]
+        columns = self.header if headerRows else None
+        return pandas.DataFrame(rows, columns=columns)
+
+    @staticmethod
+    def _isNumeric(text):
+        text = text.strip().replace(',', '').replace('$', '').replace('%', '')
+        if(text.startswith('(') and text.endswith(')')):
+            text = text[1:-1]
+        try:
+            float(text)
+            return True
+        except ValueError:
+            return False
+
+    @property
+    def headerRows(self):
+        if(self._headerRows is None):
+            headerRows = sorted(set(cell.rowIndex for row in self._rows for cell in row.cells if 'COLUMN_HEADER' in cell.entityTypes))
+            if(not headerRows and self._rowCount > 1):
+                for r, row in enumerate(self.grid(True)[:self.MAX_HEADER_ROWS], 1):
+                    texts = [cell.text.strip() if cell else "" for cell in row]
+                    if(any(self._isNumeric(text) for text in texts if text)):
+                        break
+                    if(r < self._rowCount and all(texts)):
+                        headerRows = list(range(1, r + 1))
+                        break
+            self._headerRows = headerRows
+        return self._headerRows
+
+    @property
+    def header(self):
+        headerRows = self.headerRows
+        grid = self.grid(True)
+        header = []
+        for c in range(self._columnCount):
+            parts = []
+            for r in headerRows:
+                cell = grid[r - 1][c]
+                text = cell.text.strip() if cell else ""
+                if(text and (not parts or parts[-1] != text)):
+                    parts.append(text)
+            header.append(' '.join(parts))
+        return header
+
+class TableColumns:
+
+    NAMES = ("page", "table", "tableId", "row", "column", "rowSpan", "columnSpan", "text", "confidence",
+             "left", "top", "width", "height")
+    _TYPES = (('page', 'i'), ('table', 'i'), ('row', 'i'), ('column', 'i'), ('rowSpan', 'i'), ('columnSpan', 'i'),
+              ('confidence', 'd'), ('left', 'd'), ('top', 'd'), ('width', 'd'), ('height', 'd'))
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self._columns["text"])
+
+    def clear(self):
+        self._columns = dict((name, array.array(typecode)) for name, typecode in self._TYPES)
+        self._columns["tableId"] = []
+        self._columns["text"] = []
+        self._exported = False
+        return self
+
+    def add(self, table, page=0, tableIndex=0):
+        if(self._exported):
+            # Exported buffers are shared with Arrow/NumPy and cannot be resized
+            self._columns = dict((name, values[:]) for name, values in self._columns.items())
+            self._exported = False
+        columns = self._columns
+        for row in table.rows:
+            for cell in row.cells:
+                bb = cell.geometry.boundingBox if cell.geometry is not None else None
+                columns["page"].append(page)
+                columns["table"].append(tableIndex)
+                columns["tableId"].append(table.id)
+                columns["row"].append(cell.rowIndex)
+                columns["column"].append(cell.columnIndex)
+                columns["rowSpan"].append(cell.rowSpan)
+                columns["columnSpan"].append(cell.columnSpan)
+                columns["text"].append(cell.cleanText)
+                columns["confidence"].append(cell.confidence)
+                if(bb is None):
+                    for name in ("left", "top", "width", "height"):
+                        columns[name].append(float("nan"))
+                else:
+                    columns["left"].append(bb.left)
+                    columns["top"].append(bb.top)
+                    columns["width"].append(bb.width)
+                    columns["height"].append(bb.height)
+        return self
+
+    def toDict(self):
+        return dict((name, self._columns[name]) for name in self.NAMES)
+
+    def rows(self):
+        columns = [self._columns[name] for name in self.NAMES]
+        for i in range(len(self)):
+            yield [column[i] for column in columns]
+
+    @staticmethod
+    def _import(module):
+        try:
+            return importlib.import_module(module)
+        except ImportError:
+            raise ImportError("Table export requires {0}. Install it with 'pip install {0}'.".format(module.split('.')[0]))
+
+    def toArrow(self):
+        pa = self._import("pyarrow")
+        self._exported = True
+        arrays = []
+        for name in self.NAMES:
+            values = self._columns[name]
+            if(isinstance(values, array.array)):
+                dataType = pa.float64() if values.typecode == 'd' else pa.int32()
+                arrays.append(pa.Array.from_buffers(dataType, len(values), [None, pa.py_buffer(values)]))
+            else:
+                arrays.append(pa.array(values, type=pa.string()))
+        return pa.Table.from_arrays(arrays, names=list(self.NAMES))
+
+    def toPandas(self):
+        pandas = self._import("pandas")
+        numpy = self._import("numpy")
+        self._exported = True
+        data = {}
+        for name in self.NAMES:
+            values = self._columns[name]
+            if(isinstance(values, array.array)):
+                data[name] = numpy.frombuffer(values, dtype=numpy.float64 if values.typecode == 'd' else numpy.int32)
+            else:
+                data[name] = values
+        return pandas.DataFrame(data, columns=list(self.NAMES))
+
+class MergedTable:
+    __slots__ = ('_fragments', '_rows', '_rowRanges')
+
+    def __init__(self, pageNumber, table):
+        self._fragments = []
+        self._rows = []
+        self._rowRanges = []
+        self.append(pageNumber, table, skipHeader=False)
+
+    def __str__(self):
+        s = ["MergedTable (pages {})\n==========\n".format(", ".join(str(p) for p in self.pages))]
+        for row in self._rows:
+            s.append("Row\n==========\n")
+            s.append(str(row) + "\n")
+        return ''.join(s)
+
+    def append(self, pageNumber, table, skipHeader=True):
+        rows = table.rows
+        if(skipHeader and self._repeatsHeader(table)):
+            headerRows = set(table.headerRows)
+            rows = [row for row in rows if not (row.cells and row.cells[0].rowIndex in headerRows)]
+        start = len(self._rows)
+        self._rows.extend(rows)
+        self._fragments.append((pageNumber, table))
+        self._rowRanges.append((pageNumber, table, start, len(self._rows)))
+
+    def _repeatsHeader(self, table):
+        first = self._fragments[0][1]
+        if(not first.headerRows or not table.headerRows):
+            return False
+        return [h.lower() for h in table.header] == [h.lower() for h in first.header]
+
+    @property
+    def fragments(self):
+        return self._fragments
+
+    @property
+    def rows(self):
+        return self._rows
+
+    @property
+    def rowRanges(self):
+        return self._rowRanges
+
+    @property
+    def pages(self):
+        return [pageNumber for pageNumber, table in self._fragments]
+
+    @property
+    def columnCount(self):
+        return self._fragments[0][1].columnCount
+
+    @property
+    def header(self):
+        return self._fragments[0][1].header
+
+class TableStitcher:
+
+    def __init__(self, positionTolerance=0.02):
+        self._positionTolerance = positionTolerance
+
+    def _continues(self, previous, table):
+        if(previous.columnCount != table.columnCount):
+            return False
+        previousHeader = [h.lower() for h in previous.header] if previous.headerRows else None
+        header = [h.lower() for h in table.header] if table.headerRows else None
+        if(previousHeader and header):
+            return previousHeader == header
+        for a, b in zip(previous.columnPositions(), table.columnPositions()):
+            if(a is None or b is None):
+                continue
+            if(abs(a - b) > self._positionTolerance):
+                return False
+        return True
+
+    def merge(self, tablesByPage):
+        merged = []
+        current = None
+        lastPage = None
+        for pageNumber, tables in tablesByPage:
+            tables = sorted(tables, key=lambda t: _boundingBox(t, "table stitching").top)
+            for i, table in enumerate(tables):
+                if(current and i == 0 and pageNumber == lastPage + 1 and self._continues(current.fragments[-1][1], table)):
+                    current.append(pageNumber, table)
+                else:
+                    current = MergedTable(pageNumber, table)
+                    merged.append(current)
+                if(i < len(tables) - 1):
+                    current = None
+            if(not tables):
+                current = None
+            lastPage = pageNumber
+        return merged
+
+class SpatialIndex:
+    __slots__ = ('_items', '_boxes', '_gridSize', '_grid')
+
+    DIRECTIONS = ("left", "right", "above", "below")
+
+    def __init__(self, items, gridSize=32):
+        self._items = items
+        self._gridSize = gridSize
+        self._boxes = []
+        self._grid = {}
+        for index, item in enumerate(items):
+            bb = _boundingBox(item, "region queries")
+            box = (bb.left, bb.top, bb.left + bb.width, bb.top + bb.height)
+            self._boxes.append(box)
+            x0, y0, x1, y1 = self._cellRange(box)
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    self._grid.setdefault((cx, cy), []).append(index)
+
+    def __len__(self):
+        return len(self._items)
+
+    def _cell(self, value):
+        return min(self._gridSize - 1, max(0, int(value * self._gridSize)))
+
+    def _cellRange(self, box):
+        return self._cell(box[0]), self._cell(box[1]), self._cell(box[2]), self._cell(box[3])
+
+    @staticmethod
+    def _toBox(region):
+        if(isinstance(region, (Geometry, GeometryView))):
+            region = region.boundingBox
+        return (region.left, region.top, region.left + region.width, region.top + region.height)
+
+    def _candidates(self, x0, y0, x1, y1):
+        found = set()
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                found.update(self._grid.get((cx, cy), ()))
+        return found
+
+    def query(self, region, contained=False):
+        box = self._toBox(region)
+        results = []
+        for index in sorted(self._candidates(*self._cellRange(box))):
+            b = self._boxes[index]
+            if(contained):
+                hit = b[0] >= box[0] and b[1] >= box[1] and b[2] <= box[2] and b[3] <= box[3]
+            else:
+                hit = b[0] < box[2] and b[2] > box[0] and b[1] < box[3] and b[3] > box[1]
+            if(hit):
+                results.append(self._items[index])
+        return results
+
+    @staticmethod
+    def _distance(a, b):
+        dx = max(0.0, b[0] - a[2], a[0] - b[2])
+        dy = max(0.0, b[1] - a[3], a[1] - b[3])
+        return (dx * dx + dy * dy) ** 0.5
+
+    @staticmethod
+    def _inDirection(a, b, direction):
+        if(direction == "right"):
+            return b[0] >= a[2] and b[1] < a[3] and b[3] > a[1]
+        elif(direction == "left"):
+            return b[2] <= a[0] and b[1] < a[3] and b[3] > a[1]
+        elif(direction == "below"):
+            return b[1] >= a[3] and b[0] < a[2] and b[2] > a[0]
+        elif(direction == "above"):
+            return b[3] <= a[1] and b[0] < a[2] and b[2] > a[0]
+        return True
+
+    def nearest(self, region, direction=None):
+        if(direction is not None and direction not in self.DIRECTIONS):
+            raise ValueError("direction must be one of {} or None".format(", ".join(self.DIRECTIONS)))
+
+        box = self._toBox(region)
+        x0, y0, x1, y1 = self._cellRange(box)
+        cellWidth = 1.0 / self._gridSize
+        seen = set()
+        best = None
+        bestDistance = None
+        for ring in range(self._gridSize + 1):
+            for index in self._candidates(x0 - ring, y0 - ring, x1 + ring, y1 + ring) - seen:
+                seen.add(index)
+                b = self._boxes[index]
+                if(not self._inDirection(box, b, direction)):
+                    continue
+                d = self._distance(box, b)
+                if(best is None or d < bestDistance or (d == bestDistance and index < best)):
+                    best = index
+                    bestDistance = d
+            if(best is not None and bestDistance <= ring * cellWidth):
+                break
+        if(best is None):
+            return None
+        return self._items[best]
+
+    @property
+    def items(self):
+        return self._items
+
+class ReadingOrder:
+
+    def __init__(self, minColumnLines=2, rowOverlap=0.5, spanOverlap=0.1):
+        self._minColumnLines = minColumnLines
+        self._rowOverlap = rowOverlap
+        self._spanOverlap = spanOverlap
+
+    def _bands(self, boxes):
+        bands = []
+        bottom = None
+        for i in sorted(range(len(boxes)), key=lambda i: boxes[i][2]):
+            left, right, top, height = boxes[i]
+            if(bands and top < bottom):
+                bands[-1].append(i)
+            else:
+                bands.append([i])
+                bottom = top + self._rowOverlap * height
+        for band in bands:
+            band.sort(key=lambda i: boxes[i][0])
+        return bands
+
+    def _gutters(self, boxes, bandOf):
+        # A gutter is an x-range left empty between lines that sit side by side
+        gaps = []
+        above = []
+        for i in sorted(range(len(boxes)), key=lambda i: boxes[i][2]):
+            left, right, top, height = boxes[i]
+            above = [j for j in above if boxes[j][2] + boxes[j][3] > top]
+            for j in above:
+                if(boxes[j][1] < left):
+                    gaps.append((boxes[j][1], left, bandOf[i], bandOf[j]))
+                elif(right < boxes[j][0]):
+                    gaps.append((right, boxes[j][0], bandOf[i], bandOf[j]))
+            above.append(i)
+
+        clusters = []
+        for low, high, first, second in sorted(gaps):
+            if(clusters and low < clusters[-1][1]):
+                cluster = clusters[-1]
+                cluster[0] = low
+                cluster[1] = min(cluster[1], high)
+                cluster[2] += 1
+                cluster[3].update((first, second))
+            else:
+                clusters.append([low, high, 1, set((first, second))])
+        return [((low + high) / 2, bands) for low, high, count, bands in clusters if count >= self._minColumnLines]
+
+    def order(self, lines):
+        boxes = []
+        for line in lines:
+            bb = _boundingBox(line, "reading order")
+            boxes.append((bb.left, bb.left + bb.width, bb.top, bb.height))
+        bands = self._bands(boxes)
+        bandOf = [0] * len(boxes)
+        for b, band in enumerate(bands):
+            for i in band:
+                bandOf[i] = b
+        gutters = self._gutters(boxes, bandOf)
+        mids = [mid for mid, supported in gutters]
+        active = [False] * len(gutters)
+
+        def column(x):
+            c = bisect.bisect_right(mids, x)
+            while(c > 0 and not active[c - 1]):
+                c -= 1
+            return c
+
+        result = []
+        section = {}
+        for b, band in enumerate(bands):
+            for g, (mid, supported) in enumerate(gutters):
+                if(b in supported):
+                    active[g] = True
+            for i in band:
+                left, right = boxes[i][0], boxes[i][1]
+                minOverlap = self._spanOverlap * (right - left)
+                crossed = [g for g in range(bisect.bisect_right(mids, left), bisect.bisect_left(mids, right))
+                           if active[g] and min(right - mids[g], mids[g] - left) > minOverlap]
+                if(crossed or not any(active)):
+                    for c in sorted(section):
+                        result.extend((c, lines[j]) for j in section[c])
+                    section = {}
+                    result.append((column(left), lines[i]))
+                    # A line across a gutter ends those columns until lines beside each other open it again
+                    for g in crossed:
+                        active[g] = False
+                else:
+                    section.setdefault(column((left + right) / 2), []).append(i)
+        for c in sorted(section):
+            result.extend((c, lines[j]) for j in section[c])
+        return result
+
 class Page:
 
-    def __init__(self, blocks, blockMap):
+    __slots__ = ('_blocks', '_text', '_lines', '_form', '_tables', '_content', '_geometry', '_id',
+                 '_wordIndex', '_lineIndex', '_cellIndex', '_readingOrderCache', '_textMap')
+
+    def __init__(self, blocks, blockMap, context=None):
         self._blocks = blocks
-        self._text = ""
+        self._text = None
         self._lines = []
         self._form = Form()
         self._tables = []
         self._content = []
-
-        self._parse(blockMap)
+        self._geometry = None
+        self._wordIndex = None
+        self._lineIndex = None
+        self._cellIndex = None
+        self._readingOrderCache = None
+        self._textMap = None
+
+        if(context is None):
+            context = ParseContext(blockMap)
+        if(context.stats is None):
+            self._parse(blockMap, context)
+        else:
+            started = time.perf_counter()
+            self._parse(blockMap, context)
+            context.stats.count("Page")
+            context.stats.addTime("page", time.perf_counter() - started)
 
     def __str__(self):
-        s = "Page\n==========\n"
-        for item in self._content:
-            s = s + str(item) + "\n"
-        return s
+        s = ["Page\n==========\n"]
+        s.extend(str(item) + "\n" for item in self._content)
+        return ''.join(s)
 
-    def _parse(self, blockMap):
+    def _parse(self, blockMap, context):
+        stats = context.stats
         for item in self._blocks:
+            if(stats is not None):
+                started = time.perf_counter()
             if item["BlockType"] == "PAGE":
-                self._geometry = Geometry(item['Geometry'])
+                self._geometry = _geometry(item, context)
                 self._id = item['Id']
+            elif not context.includes(item["BlockType"]):
+                continue
             elif item["BlockType"] == "LINE":
-                l = Line(item, blockMap)
+                l = Line(item, blockMap, context)
                 self._lines.append(l)
                 self._content.append(l)
-                self._text = self._text + l.text + '\n'
+                if(stats is not None):
+                    stats.count("Line")
+                    stats.addText(l.text)
             elif item["BlockType"] == "TABLE":
-                t = Table(item, blockMap)
+                t = Table(item, blockMap, context)
                 self._tables.append(t)
                 self._content.append(t)
+                if(stats is not None):
+                    stats.count("Table")
+                    stats.count("Row", len(t.rows))
+                    stats.count("Cell", sum(len(row.cells) for row in t.rows))
             elif item["BlockType"] == "KEY_VALUE_SET":
                 if 'KEY' in item['EntityTypes']:
-                    f = Field(item, blockMap)
+                    f = Field(item, blockMap, context)
                     if(f.key):
                         self._form.addField(f)
                         self._content.append(f)
+                        if(stats is not None):
+                            stats.count("Field")
                     else:
                         print("WARNING: Detected K/V where key does not have content. Excluding key from output.")
                         print(f)
                         print(item)
+            if(stats is not None):
+                stats.addBlockTime(item["BlockType"], time.perf_counter() - started)
 
-    def getLinesInReadingOrder(self):
-        columns = []
-        lines = []
-        for item in self._lines:
-                column_found=False
-                for index, column in enumerate(columns):
-                    bbox_left = item.geometry.boundingBox.left
-                    bbox_right = item.geometry.boundingBox.left + item.geometry.boundingBox.width
-                    bbox_centre = item.geometry.boundingBox.left + item.geometry.boundingBox.width/2
-                    column_centre = column['left'] + column['right']/2
-                    if (bbox_centre > column['left'] and bbox_centre < column['right']) or (column_centre > bbox_left and column_centre < bbox_right):
-                        #Bbox appears inside the column
-                        lines.append([index, item.text])
-                        column_found=True
-                        break
-                if not column_found:
-                    columns.append({'left':item.geometry.boundingBox.left, 'right':item.geometry.boundingBox.left + item.geometry.boundingBox.width})
-                    lines.append([len(columns)-1, item.text])
+    def _readingOrder(self):
+        if(self._readingOrderCache is None):
+            self._readingOrderCache = ReadingOrder().order(self._lines)
+        return self._readingOrderCache
 
-        lines.sort(key=lambda x: x[0])
-        return lines
+    @property
+    def linesInReadingOrder(self):
+        return [line for column, line in self._readingOrder()]
+
+    def getLinesInReadingOrder(self):
+        return [[column, line.text] for column, line in self._readingOrder()]
 
     def getTextInReadingOrder(self):
-        lines = self.getLinesInReadingOrder()
-        text = ""
-        for line in lines:
-            text = text + line[1] + '\n'
-        return text
+        return ''.join([line.text + '\n' for column, line in self._readingOrder()])
+
+    def _iterNodes(self):
+        for line in self._lines:
+            yield line
+            for word in line.words:
+                yield word
+        for table in self._tables:
+            yield table
+            for row in table.rows:
+                for cell in row.cells:
+                    yield cell
+                    for item in cell.content:
+                        yield item
+        for field in self._form.fields:
+            for part in (field.key, field.value):
+                if(part):
+                    yield part
+                    for item in part.content:
+                        yield item
+
+    def _detachBlocks(self):
+        self._blocks = None
+        if(self._geometry is not None):
+            self._geometry.detach()
+        for node in self._iterNodes():
+            if(hasattr(node, '_block')):
+                node._block = None
+            if(node.geometry is not None):
+                node.geometry.detach()
+
+    @property
+    def wordIndex(self):
+        if(self._wordIndex is None):
+            self._wordIndex = SpatialIndex([word for line in self._lines for word in line.words])
+        return self._wordIndex
+
+    @property
+    def lineIndex(self):
+        if(self._lineIndex is None):
+            self._lineIndex = SpatialIndex(self._lines)
+        return self._lineIndex
+
+    @property
+    def cellIndex(self):
+        if(self._cellIndex is None):
+            self._cellIndex = SpatialIndex([cell for table in self._tables for row in table.rows for cell in row.cells])
+        return self._cellIndex
+
+    def _spatialIndex(self, blockType):
+        if(blockType == "WORD"):
+            return self.wordIndex
+        elif(blockType == "LINE"):
+            return self.lineIndex
+        elif(blockType == "CELL"):
+            return self.cellIndex
+        raise ValueError("blockType must be WORD, LINE or CELL")
+
+    def wordsInRegion(self, region, contained=False):
+        return self.wordIndex.query(region, contained)
+
+    def linesInRegion(self, region, contained=False):
+        return self.lineIndex.query(region, contained)
+
+    def cellsInRegion(self, region, contained=False):
+        return self.cellIndex.query(region, contained)
+
+    def nearest(self, region, direction=None, blockType="LINE"):
+        return self._spatialIndex(blockType).nearest(region, direction)
 
     @property
     def blocks(self):
@@ -558,8 +1433,16 @@ class Page:
 
     @property
     def text(self):
+        if(self._text is None):
+            self._text = ''.join([line.text + '\n' for line in self._lines])
         return self._text
 
+    @property
+    def textMap(self):
+        if(self._textMap is None):
+            self._textMap = PageTextMap(self)
+        return self._textMap
+
     @property
     def lines(self):
         return self._lines
@@ -584,9 +1467,671 @@ class Page:
     def id(self):
         return self._id
 
+class PageList:
+
+    def __init__(self, documentPages, blockMap, context=None):
+        self._documentPages = documentPages
+        self._blockMap = blockMap
+        if(context is None):
+            context = ParseContext(blockMap)
+        self._context = context
+        self._pages = [None] * len(documentPages)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._pages)
+
+    def __getitem__(self, index):
+        if(isinstance(index, slice)):
+            return [self._getPage(i) for i in range(*index.indices(len(self._pages)))]
+        if(index < 0):
+            index += len(self._pages)
+        if(index < 0 or index >= len(self._pages)):
+            raise IndexError("page index out of range")
+        return self._getPage(index)
+
+    def __iter__(self):
+        for i in range(len(self._pages)):
+            yield self._getPage(i)
+
+    def _getPage(self, index):
+        page = self._pages[index]
+        if(page is None):
+            with self._lock:
+                page = self._pages[index]
+                if(page is None):
+                    page = Page(self._documentPages[index]["Blocks"], self._blockMap, self._context)
+                    self._pages[index] = page
+        return page
+
+    @property
+    def parsedCount(self):
+        return sum(1 for page in self._pages if page is not None)
+
+class GeometryView:
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    def __str__(self):
+        s = "BoundingBox: {}\n".format(str(self.boundingBox))
+        return s
+
+    @property
+    def boundingBox(self):
+        store = self._store
+        i = self._index
+        return BoundingBox(float(store.width[i]), float(store.height[i]), float(store.left[i]), float(store.top[i]))
+
+    @property
+    def polygon(self):
+        store = self._store
+        points = store.polygonPoints[store.polygonOffsets[self._index]:store.polygonOffsets[self._index + 1]]
+        return [Polygon(float(x), float(y)) for x, y in points]
+
+class GeometryStore:
+
+    def __init__(self, documentPages):
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("GeometryStore requires numpy. Install it with 'pip install numpy'.")
+        self._numpy = numpy
+
+        ids = []
+        blockTypes = []
+        pages = []
+        confidence = []
+        boxes = []
+        polygonOffsets = [0]
+        polygonPoints = []
+        for pageNumber, documentPage in enumerate(documentPages, 1):
+            for block in documentPage["Blocks"]:
+                if('Geometry' not in block):
+                    continue
+                geometry = block['Geometry']
+                boundingBox = geometry["BoundingBox"]
+                ids.append(block['Id'])
+                blockTypes.append(block['BlockType'])
+                pages.append(pageNumber)
+                confidence.append(block.get('Confidence', numpy.nan))
+                boxes.append((boundingBox["Left"], boundingBox["Top"], boundingBox["Width"], boundingBox["Height"]))
+                for pg in geometry.get("Polygon", []):
+                    polygonPoints.append((pg["X"], pg["Y"]))
+                polygonOffsets.append(len(polygonPoints))
+
+        boxes = numpy.array(boxes, dtype=numpy.float64).reshape(-1, 4)
+        self._ids = ids
+        self._indexMap = {blockId : i for i, blockId in enumerate(ids)}
+        self._blockTypes = numpy.array(blockTypes, dtype=object)
+        self._pages = numpy.array(pages, dtype=numpy.int32)
+        self._confidence = numpy.array(confidence, dtype=numpy.float64)
+        self._left = numpy.ascontiguousarray(boxes[:, 0])
+        self._top = numpy.ascontiguousarray(boxes[:, 1])
+        self._width = numpy.ascontiguousarray(boxes[:, 2])
+        self._height = numpy.ascontiguousarray(boxes[:, 3])
+        self._polygonOffsets = numpy.array(polygonOffsets, dtype=numpy.int64)
+        self._polygonPoints = numpy.array(polygonPoints, dtype=numpy.float64).reshape(-1, 2)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def indexOf(self, blockId):
+        return self._indexMap.get(blockId)
+
+    def geometry(self, blockId):
+        index = self._indexMap.get(blockId)
+        if(index is None):
+            return None
+        return GeometryView(self, index)
+
+    def mask(self, blockType=None, page=None, minConfidence=None, maxConfidence=None, region=None, contained=True):
+        numpy = self._numpy
+        m = numpy.ones(len(self._ids), dtype=bool)
+        if(blockType is not None):
+            if(isinstance(blockType, str)):
+                m &= (self._blockTypes == blockType)
+            else:
+                m &= numpy.isin(self._blockTypes, list(blockType))
+        if(page is not None):
+            m &= (self._pages == page)
+        if(minConfidence is not None):
+            m &= (self._confidence >= minConfidence)
+        if(maxConfidence is not None):
+            m &= (self._confidence < maxConfidence)
+        if(region is not None):
+            right = region.left + region.width
+            bottom = region.top + region.height
+            if(contained):
+                m &= (self._left >= region.left) & (self._top >= region.top)
+                m &= (self._left + self._width <= right) & (self._top + self._height <= bottom)
+            else:
+                m &= (self._left < right) & (self._top < bottom)
+                m &= (self._left + self._width > region.left) & (self._top + self._height > region.top)
+        return m
+
+    def select(self, blockType=None, page=None, minConfidence=None, maxConfidence=None, region=None, contained=True):
+        return self._numpy.flatnonzero(self.mask(blockType, page, minConfidence, maxConfidence, region, contained))
+
+    def idsAt(self, indices):
+        return [self._ids[i] for i in indices]
+
+    def geometriesAt(self, indices):
+        return [GeometryView(self, int(i)) for i in indices]
+
+    @property
+    def ids(self):
+        return self._ids
+
+    @property
+    def blockTypes(self):
+        return self._blockTypes
+
+    @property
+    def pages(self):
+        return self._pages
+
+    @property
+    def confidence(self):
+        return self._confidence
+
+    @property
+    def left(self):
+        return self._left
+
+    @property
+    def top(self):
+        return self._top
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def polygonOffsets(self):
+        return self._polygonOffsets
+
+    @property
+    def polygonPoints(self):
+        return self._polygonPoints
+
+def _unionGeometry(nodes):
+    if(not nodes or any(node.geometry is None for node in nodes)):
+        return None
+    if(len(nodes) == 1):
+        return nodes[0].geometry
+    boxes = [node.geometry.boundingBox for node in nodes]
+    left = min(bb.left for bb in boxes)
+    top = min(bb.top for bb in boxes)
+    right = max(bb.left + bb.width for bb in boxes)
+    bottom = max(bb.top + bb.height for bb in boxes)
+    return Geometry({"BoundingBox" : {"Width" : right - left, "Height" : bottom - top, "Left" : left, "Top" : top}}, polygon=False)
+
+def _wordsInTextOrder(line):
+    tokens = {}
+    for m in re.finditer(r'\S+', line.text):
+        tokens.setdefault(m.group(), collections.deque()).append(m.start())
+    located = []
+    unlocated = []
+    for word in line.words:
+        starts = tokens.get(word.text)
+        if(starts):
+            located.append((starts.popleft(), word))
+        else:
+            unlocated.append((None, word))
+    located.sort(key=lambda item: item[0])
+    return located + unlocated
+
+class TextHit:
+    __slots__ = ('_words', '_pageNumber', '_position')
+
+    def __init__(self, words, pageNumber, position):
+        self._words = words
+        self._pageNumber = pageNumber
+        self._position = position
+
+    def __str__(self):
+        return "page {}: {}".format(self._pageNumber, self.text)
+
+    @property
+    def words(self):
+        return self._words
+
+    @property
+    def pageNumber(self):
+        return self._pageNumber
+
+    @property
+    def position(self):
+        return self._position
+
+    @property
+    def text(self):
+        return ' '.join(word.text for word in self._words)
+
+    @property
+    def geometry(self):
+        return _unionGeometry(self._words)
+
+class TextIndex:
+    __slots__ = ('_words', '_pageNumbers', '_postings', '_terms')
+
+    PUNCTUATION = '.,;:!?"\'()[]{}<>'
+
+    def __init__(self, pages):
+        self._words = []
+        self._pageNumbers = array.array('l')
+        self._postings = {}
+        for pageNumber, page in enumerate(pages, 1):
+            seen = set()
+            words = [word for line in page.lines for start, word in _wordsInTextOrder(line)]
+            words.extend(item for table in page.tables for row in table.rows for cell in row.cells
+                         for item in cell.content if isinstance(item, Word))
+            words.extend(item for field in page.form.fields for part in (field.key, field.value) if part
+                         for item in part.content if isinstance(item, Word))
+            for word in words:
+                if(word.id in seen):
+                    continue
+                seen.add(word.id)
+                term = self.normalizeTerm(word.text)
+                if(not term):
+                    continue
+                postings = self._postings.get(term)
+                if(postings is None):
+                    postings = array.array('l')
+                    self._postings[term] = postings
+                postings.append(len(self._words))
+                self._words.append(word)
+                self._pageNumbers.append(pageNumber)
+        self._terms = sorted(self._postings)
+
+    @classmethod
+    def normalizeTerm(cls, text):
+        return text.lower().strip(cls.PUNCTUATION)
+
+    def _hit(self, position, length=1):
+        return TextHit(self._words[position:position + length], self._pageNumbers[position], position)
+
+    def term(self, term):
+        return [self._hit(p) for p in self._postings.get(self.normalizeTerm(term), ())]
+
+    def phrase(self, phrase):
+        terms = [self.normalizeTerm(t) for t in phrase.split()]
+        terms = [t for t in terms if t]
+        if(not terms):
+            return []
+        postings = [self._postings.get(term, ()) for term in terms]
+        anchor = min(range(len(terms)), key=lambda i: len(postings[i]))
+        positions = [p - anchor for p in postings[anchor] if p >= anchor]
+        for offset, candidates in enumerate(postings):
+            if(offset != anchor):
+                positions = [p for p in positions if self._contains(candidates, p + offset)]
+        return [self._hit(p, len(terms)) for p in positions]
+
+    @staticmethod
+    def _contains(postings, position):
+        i = bisect.bisect_left(postings, position)
+        return i < len(postings) and postings[i] == position
+
+    def prefix(self, prefix):
+        prefix = self.normalizeTerm(prefix)
+        positions = []
+        for term in self._terms[bisect.bisect_left(self._terms, prefix):]:
+            if(not term.startswith(prefix)):
+                break
+            positions.extend(self._postings[term])
+        return [self._hit(p) for p in sorted(positions)]
+
+    @property
+    def terms(self):
+        return self._terms
+
+    @property
+    def wordCount(self):
+        return len(self._words)
+
+class PageTextMap:
+    __slots__ = ('_text', '_starts', '_ends', '_words')
+
+    def __init__(self, page):
+        self._text = page.text
+        self._starts = array.array('l')
+        self._ends = array.array('l')
+        self._words = []
+        offset = 0
+        for line in page.lines:
+            for start, word in _wordsInTextOrder(line):
+                if(start is None):
+                    continue
+                self._starts.append(offset + start)
+                self._ends.append(offset + start + len(word.text))
+                self._words.append(word)
+            offset += len(line.text) + 1
+
+    def wordsAt(self, start, end):
+        i = bisect.bisect_right(self._starts, start) - 1
+        if(i < 0 or self._ends[i] <= start):
+            i += 1
+        j = bisect.bisect_left(self._starts, end)
+        return self._words[i:j]
+
+    @property
+    def text(self):
+        return self._text
+
+    @property
+    def words(self):
+        return self._words
+
+class Entity:
+    __slots__ = ('_label', '_text', '_start', '_end', '_words', '_pageNumber')
+
+    def __init__(self, label, text, start, end, words, pageNumber=None):
+        self._label = label
+        self._text = text
+        self._start = start
+        self._end = end
+        self._words = words
+        self._pageNumber = pageNumber
+
+    def __str__(self):
+        return "{}: {}".format(self._label, self._text)
+
+    @property
+    def label(self):
+        return self._label
+
+    @property
+    def text(self):
+        return self._text
+
+    @property
+    def start(self):
+        return self._start
+
+    @property
+    def end(self):
+        return self._end
+
+    @property
+    def words(self):
+        return self._words
+
+    @property
+    def lines(self):
+        lines = []
+        for word in self._words:
+            if(word.line is not None and (not lines or lines[-1] is not word.line)):
+                lines.append(word.line)
+        return lines
+
+    @property
+    def pageNumber(self):
+        return self._pageNumber
+
+    @property
+    def geometry(self):
+        return _unionGeometry(self._words)
+
+class EntityExtractor:
+
+    def __init__(self, ignoreCase=True, wholeWords=True):
+        self._ignoreCase = ignoreCase
+        self._wholeWords = wholeWords
+        self._terms = []
+        self._patterns = []
+        self._labels = None
+        self._regex = None
+
+    def addTerms(self, label, terms):
+        self._terms.extend((label, term) for term in terms if term)
+        self._regex = None
+
+    def _composed(self, i, pattern, ignoreCase):
+        return "(?P<_p{}>(?{}:{}))".format(i, "i" if ignoreCase else "", pattern)
+
+    def addPattern(self, label, pattern, ignoreCase=False):
+        compiled = re.compile(pattern, re.IGNORECASE if ignoreCase else 0)
+        standalone = compiled.groups > 0 or bool(re.compile(pattern).flags & ~re.UNICODE)
+        if(not standalone):
+            try:
+                re.compile(self._composed(0, pattern, ignoreCase))
+            except re.error:
+                standalone = True
+        # Capture groups, backreferences and global flags do not survive being pasted into one alternation
+        self._patterns.append((label, pattern, ignoreCase, compiled if standalone else None))
+        self._regex = None
+
+    def _fold(self, text):
+        return text.casefold() if self._ignoreCase else text
+
+    def _trieRegex(self, node):
+        branches = [re.escape(c) + self._trieRegex(child) for c, child in sorted(node.items()) if c]
+        if(not branches):
+            return ''
+        regex = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if('' in node):
+            regex = '(?:' + regex + ')?'
+        return regex
+
+    def compile(self):
+        if(self._regex is None):
+            trie = {}
+            self._labels = {}
+            for label, term in self._terms:
+                node = trie
+                for c in (term.lower() if self._ignoreCase else term):
+                    node = node.setdefault(c, {})
+                node[''] = True
+                labels = self._labels.setdefault(self._fold(term), [])
+                if(label not in labels):
+                    labels.append(label)
+            parts = []
+            if(trie):
+                regex = "(?{}:{})".format("i" if self._ignoreCase else "", self._trieRegex(trie))
+                if(self._wholeWords):
+                    regex = r"(?<!\w)" + regex + r"(?!\w)"
+                parts.append("(?P<_t>{})".format(regex))
+            for i, (label, pattern, ignoreCase, compiled) in enumerate(self._patterns):
+                if(compiled is None):
+                    parts.append(self._composed(i, pattern, ignoreCase))
+            self._regex = re.compile('|'.join(parts)) if parts else re.compile(r"(?!)")
+        return self
+
+    def scan(self, text):
+        self.compile()
+        matches = []
+        for m in self._regex.finditer(text):
+            if(m.end() == m.start()):
+                continue
+            if(m.lastgroup == "_t"):
+                # (?i) and casefold can disagree on rare characters; skip a match rather than fail on it
+                for label in self._labels.get(self._fold(m.group()), ()):
+                    matches.append((m.start(), m.end(), label))
+            else:
+                matches.append((m.start(), m.end(), self._patterns[int(m.lastgroup[2:])][0]))
+        standalone = [(label, compiled) for label, pattern, ignoreCase, compiled in self._patterns if compiled is not None]
+        for label, compiled in standalone:
+            matches.extend((m.start(), m.end(), label) for m in compiled.finditer(text) if m.end() > m.start())
+        if(standalone):
+            matches.sort(key=lambda m: (m[0], -m[1]))
+        return matches
+
+    def extract(self, page, pageNumber=None):
+        textMap = page.textMap
+        text = textMap.text
+        return [Entity(label, text[start:end], start, end, textMap.wordsAt(start, end), pageNumber)
+                for start, end, label in self.scan(text)]
+
+class ConfidenceIndex:
+
+    KINDS = ("WORD", "LINE", "CELL", "KEY", "VALUE")
+    PERCENTILES = (5, 25, 50, 75, 95)
+
+    def __init__(self, pages):
+        confidences = dict((kind, []) for kind in self.KINDS)
+        entries = dict((kind, []) for kind in self.KINDS)
+        self._pageValues = []
+        for pageNumber, page in enumerate(pages, 1):
+            seen = set()
+            items = [("LINE", line) for line in page.lines]
+            items.extend(("WORD", word) for line in page.lines for word in line.words)
+            for table in page.tables:
+                for row in table.rows:
+                    for cell in row.cells:
+                        items.append(("CELL", cell))
+                        items.extend(("WORD", item) for item in cell.content if isinstance(item, Word))
+            for field in page.form.fields:
+                for kind, part in (("KEY", field.key), ("VALUE", field.value)):
+                    if(part):
+                        items.append((kind, part))
+                        items.extend(("WORD", item) for item in part.content if isinstance(item, Word))
+            values = dict((kind, []) for kind in self.KINDS)
+            for kind, node in items:
+                if(node.id in seen):
+                    continue
+                seen.add(node.id)
+                confidences[kind].append(node.confidence)
+                entries[kind].append((pageNumber, node))
+                values[kind].append(node.confidence)
+            for kind in self.KINDS:
+                values[kind].sort()
+            self._pageValues.append(values)
+
+        self._confidences = {}
+        self._entries = {}
+        for kind in self.KINDS:
+            values = confidences[kind]
+            order = sorted(range(len(values)), key=values.__getitem__)
+            self._confidences[kind] = array.array('d', [values[i] for i in order])
+            self._entries[kind] = [entries[kind][i] for i in order]
+
+    def _kinds(self, kinds):
+        if(kinds is None):
+            return self.KINDS
+        if(isinstance(kinds, str)):
+            kinds = (kinds,)
+        unknown = set(kinds) - set(self.KINDS)
+        if(unknown):
+            raise ValueError("unknown confidence kinds: {}".format(", ".join(sorted(unknown))))
+        return kinds
+
+    def _merge(self, kinds, counts):
+        streams = [zip(self._confidences[kind][:counts[kind]], self._entries[kind][:counts[kind]]) for kind in kinds]
+        return [entry for confidence, entry in heapq.merge(*streams, key=lambda item: item[0])]
+
+    def below(self, threshold, kinds=None):
+        kinds = self._kinds(kinds)
+        counts = dict((kind, bisect.bisect_left(self._confidences[kind], threshold)) for kind in kinds)
+        return self._merge(kinds, counts)
+
+    def lowest(self, k, kinds=None):
+        kinds = self._kinds(kinds)
+        counts = dict((kind, min(k, len(self._entries[kind]))) for kind in kinds)
+        return self._merge(kinds, counts)[:k]
+
+    def count(self, kinds=None):
+        return sum(len(self._entries[kind]) for kind in self._kinds(kinds))
+
+    def pagePercentiles(self, kind="WORD", percentiles=PERCENTILES):
+        self._kinds(kind)
+        summaries = []
+        for values in self._pageValues:
+            values = values[kind]
+            summary = {}
+            if(values):
+                for p in percentiles:
+                    summary[p] = values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+            summaries.append(summary)
+        return summaries
+
+class RelationshipIndex:
+
+    def __init__(self):
+        self._ids = []
+        self._positions = {}
+        self._edges = {}
+        self._children = None
+        self._parents = None
+
+    def _position(self, blockId):
+        position = self._positions.get(blockId)
+        if(position is None):
+            position = len(self._ids)
+            self._positions[blockId] = position
+            self._ids.append(blockId)
+        return position
+
+    def add(self, block):
+        source = self._position(block['Id'])
+        for rs in block.get('Relationships') or ():
+            edges = self._edges.get(rs['Type'])
+            if(edges is None):
+                edges = (array.array('l'), array.array('l'))
+                self._edges[rs['Type']] = edges
+            for cid in rs['Ids']:
+                edges[0].append(source)
+                edges[1].append(self._position(cid))
+        self._children = None
+        self._parents = None
+
+    def _compress(self, sources, targets):
+        count = len(self._ids)
+        offsets = array.array('l', [0]) * (count + 1)
+        for source in sources:
+            offsets[source + 1] += 1
+        for i in range(count):
+            offsets[i + 1] += offsets[i]
+        fill = offsets[:-1]
+        values = array.array('l', [0]) * len(targets)
+        for source, target in zip(sources, targets):
+            values[fill[source]] = target
+            fill[source] += 1
+        return offsets, values
+
+    def _build(self):
+        if(self._children is None):
+            children = {}
+            parents = {}
+            for relationshipType, (sources, targets) in self._edges.items():
+                children[relationshipType] = self._compress(sources, targets)
+                parents[relationshipType] = self._compress(targets, sources)
+            self._parents = parents
+            self._children = children
+
+    def _lookup(self, csr, blockId, relationshipTypes):
+        position = self._positions.get(blockId)
+        if(position is None):
+            return []
+        ids = []
+        for relationshipType in relationshipTypes:
+            if(relationshipType in csr):
+                offsets, values = csr[relationshipType]
+                ids.extend(self._ids[v] for v in values[offsets[position]:offsets[position + 1]])
+        return ids
+
+    def childrenOf(self, blockId, relationshipType="CHILD"):
+        self._build()
+        return self._lookup(self._children, blockId, (relationshipType,))
+
+    def parentsOf(self, blockId, relationshipType=None):
+        self._build()
+        relationshipTypes = sorted(self._parents) if relationshipType is None else (relationshipType,)
+        return self._lookup(self._parents, blockId, relationshipTypes)
+
+    @property
+    def relationshipTypes(self):
+        return sorted(self._edges)
+
 class Document:
 
-    def __init__(self, responsePages):
+    def __init__(self, responsePages, lazy=False, stats=False, tracer=None, include=None, geometry="full"):
 
         if(not isinstance(responsePages, list)):
             rps = []
@@ -594,43 +2139,140 @@ class Document:
             responsePages = rps
 
         self._responsePages = responsePages
+        self._lazy = lazy
+        self._shared = False
+        self._blockCount = None
+        self._snapshot = None
+        self._parseStats = ParseStats(tracer) if (stats or tracer) else None
+        self._include = include
+        self._geometryMode = geometry
         self._pages = []
+        self._initIndexes()
 
         self._parse()
 
     def __str__(self):
-        s = "\nDocument\n==========\n"
-        for p in self._pages:
-            s = s + str(p) + "\n\n"
-        return s
+        s = ["\nDocument\n==========\n"]
+        s.extend(str(p) + "\n\n" for p in self._pages)
+        return ''.join(s)
+
+    @classmethod
+    def _fromParsed(cls, responsePages, documentPages, blockMap, context, pages, relationships=None):
+        doc = cls.__new__(cls)
+        doc._responsePages = responsePages
+        doc._lazy = False
+        doc._shared = False
+        doc._blockCount = None
+        doc._snapshot = None
+        doc._parseStats = context.stats
+        doc._include = context.include
+        doc._geometryMode = context.geometryMode
+        doc._responseDocumentPages = documentPages
+        doc._blockMap = blockMap
+        doc._context = context
+        doc._pages = pages
+        doc._relationships = relationships
+        doc._initIndexes()
+        return doc
+
+    def _initIndexes(self):
+        self._indexLock = threading.RLock()
+        self._geometryStore = None
+        self._fieldIndex = None
+        self._mergedTables = None
+        self._textIndex = None
+        self._confidenceIndex = None
+
+    def _cachedIndex(self, name, factory):
+        index = getattr(self, name)
+        if(index is None):
+            # Cached documents are shared between threads, so each index is built once under the lock
+            with self._indexLock:
+                index = getattr(self, name)
+                if(index is None):
+                    index = factory()
+                    setattr(self, name, index)
+        return index
+
+    @classmethod
+    def fromStream(cls, stream, lazy=False, stats=False, tracer=None, include=None, geometry="full"):
+        builder = DocumentBuilder(buildPages=not lazy, stats=stats, tracer=tracer, include=include, geometry=geometry)
+        for page in ResponseStreamReader(stream).readInto(builder):
+            pass
+        return builder.document()
+
+    @classmethod
+    def fromFile(cls, filePath, lazy=False, stats=False, tracer=None, include=None, geometry="full"):
+        with open(filePath, 'rb') as stream:
+            return cls.fromStream(stream, lazy=lazy, stats=stats, tracer=tracer, include=include, geometry=geometry)
+
+    @classmethod
+    def load(cls, filePath):
+        return DocumentSnapshot(filePath).document()
+
+    def close(self):
+        if(self._snapshot is not None):
+            self._snapshot.close()
+            self._snapshot = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def save(self, filePath):
+        self._checkAttached()
+        DocumentSnapshot.write(self, filePath)
+
+    def _checkAttached(self):
+        if(self._responsePages is None):
+            raise ValueError("document has been detached from its response blocks")
+
+    def detach(self):
+        if(self._responsePages is None):
+            return 0
+        if(self._shared):
+            raise ValueError("document is shared through a DocumentCache and cannot be detached")
+        self._blockCount = len(self._blockMap)
+        freed = _containerBytes(self._responsePages, self._responseDocumentPages, self._blockMap)
+        pages = list(self._pages)
+        for page in pages:
+            page._detachBlocks()
+        self._pages = pages
+        self._responsePages = None
+        self._responseDocumentPages = None
+        self._blockMap = None
+        self._context.detach()
+        return freed
+
+    @property
+    def detached(self):
+        return self._responsePages is None
 
     def _parseDocumentPagesAndBlockMap(self):
 
-        blockMap = {}
-
-        documentPages = []
-        documentPage = None
+        builder = DocumentBuilder(buildPages=False)
         for page in self._responsePages:
-            for block in page['Blocks']:
-                if('BlockType' in block and 'Id' in block):
-                    blockMap[block['Id']] = block
-
-                if(block['BlockType'] == 'PAGE'):
-                    if(documentPage):
-                        documentPages.append({"Blocks" : documentPage})
-                    documentPage = []
-                    documentPage.append(block)
-                else:
-                    documentPage.append(block)
-        if(documentPage):
-            documentPages.append({"Blocks" : documentPage})
-        return documentPages, blockMap
+            builder.append(page)
+        builder.finish()
+        return builder.pageBlocks, builder.blockMap, builder.relationships
 
     def _parse(self):
 
-        self._responseDocumentPages, self._blockMap = self._parseDocumentPagesAndBlockMap()
+        stats = self._parseStats
+        if(stats is not None):
+            started = time.perf_counter()
+        self._responseDocumentPages, self._blockMap, self._relationships = self._parseDocumentPagesAndBlockMap()
+        if(stats is not None):
+            stats.addTime("blockMap", time.perf_counter() - started)
+            stats.countBlocks(self._blockMap.values())
+        self._context = ParseContext(self._blockMap, stats, self._include, self._geometryMode)
+        if(self._lazy):
+            self._pages = PageList(self._responseDocumentPages, self._blockMap, self._context)
+            return
         for documentPage in self._responseDocumentPages:
-            page = Page(documentPage["Blocks"], self._blockMap)
+            page = Page(documentPage["Blocks"], self._blockMap, self._context)
             self._pages.append(page)
 
     @property
@@ -645,9 +2287,882 @@ class Document:
     def pages(self):
         return self._pages
 
+    @property
+    def relationships(self):
+        return self._cachedIndex('_relationships', self._buildRelationships)
+
+    def _buildRelationships(self):
+        self._checkAttached()
+        relationships = RelationshipIndex()
+        for documentPage in self._responseDocumentPages:
+            for block in documentPage["Blocks"]:
+                relationships.add(block)
+        return relationships
+
+    def childrenOf(self, blockId, relationshipType="CHILD"):
+        return self.relationships.childrenOf(blockId, relationshipType)
+
+    def parentsOf(self, blockId, relationshipType=None):
+        return self.relationships.parentsOf(blockId, relationshipType)
+
+    @property
+    def blockCount(self):
+        if(self._blockMap is None):
+            return self._blockCount
+        return len(self._blockMap)
+
+    @property
+    def parseStats(self):
+        return self._parseStats
+
+    def iterTables(self):
+        for pageNumber, page in enumerate(self._pages, 1):
+            for table in page.tables:
+                yield pageNumber, table
+
+    def mergedTables(self, stitcher=None):
+        if(stitcher is not None):
+            return stitcher.merge((pageNumber, page.tables) for pageNumber, page in enumerate(self._pages, 1))
+        return self._cachedIndex('_mergedTables', lambda: TableStitcher().merge(
+            (pageNumber, page.tables) for pageNumber, page in enumerate(self._pages, 1)))
+
+    def tablesToCsv(self, fp):
+        writer = csv.writer(fp)
+        writer.writerow(TableColumns.NAMES)
+        columns = TableColumns()
+        for tableIndex, (pageNumber, table) in enumerate(self.iterTables()):
+            writer.writerows(columns.clear().add(table, pageNumber, tableIndex).rows())
+
+    def tablesToParquet(self, filePath):
+        parquet = TableColumns._import("pyarrow.parquet")
+        writer = None
+        columns = TableColumns()
+        try:
+            for tableIndex, (pageNumber, table) in enumerate(self.iterTables()):
+                arrowTable = columns.clear().add(table, pageNumber, tableIndex).toArrow()
+                if(writer is None):
+                    writer = parquet.ParquetWriter(filePath, arrowTable.schema)
+                writer.write_table(arrowTable)
+            if(writer is None):
+                parquet.write_table(TableColumns().toArrow(), filePath)
+        finally:
+            if(writer is not None):
+                writer.close()
+
+    def writeText(self, fp, readingOrder=False):
+        for page in self._pages:
+            if(readingOrder):
+                fp.write(page.getTextInReadingOrder())
+            else:
+                fp.write(page.text)
+
+    @property
+    def geometryStore(self):
+        if(self._geometryStore is None):
+            self._checkAttached()
+        return self._cachedIndex('_geometryStore', lambda: GeometryStore(self._responseDocumentPages))
+
+    @property
+    def fieldIndex(self):
+        return self._cachedIndex('_fieldIndex', lambda: FieldIndex([field for page in self._pages for field in page.form.fields]))
+
+    @property
+    def textIndex(self):
+        return self._cachedIndex('_textIndex', lambda: TextIndex(self._pages))
+
+    def searchText(self, phrase):
+        return self.textIndex.phrase(phrase)
+
+    def searchTextPrefix(self, prefix):
+        return self.textIndex.prefix(prefix)
+
+    @property
+    def confidenceIndex(self):
+        return self._cachedIndex('_confidenceIndex', lambda: ConfidenceIndex(self._pages))
+
+    def below(self, threshold, kinds=None):
+        return self.confidenceIndex.below(threshold, kinds)
+
+    def lowest(self, k, kinds=None):
+        return self.confidenceIndex.lowest(k, kinds)
+
+    def extractEntities(self, extractor):
+        extractor.compile()
+        entities = []
+        for pageNumber, page in enumerate(self._pages, 1):
+            entities.extend(extractor.extract(page, pageNumber))
+        return entities
+
+    def getFieldsByKey(self, key):
+        return self.fieldIndex.exact(key)
+
+    def searchFieldsByKey(self, key):
+        return self.fieldIndex.contains(key)
+
+    def searchFieldsByKeyPrefix(self, prefix):
+        return self.fieldIndex.prefix(prefix)
+
+    def searchFieldsByKeyFuzzy(self, key, minScore=0.6, limit=None):
+        return self.fieldIndex.fuzzy(key, minScore, limit)
+
+    def getNodeById(self, blockId):
+        return self._context.getNodeById(blockId)
+
     def getBlockById(self, blockId):
         block = None
         if(self._blockMap and blockId in self._blockMap):
             block = self._blockMap[blockId]
         return block
 
+    def findBlocks(self, blockType=None, page=None, minConfidence=None, maxConfidence=None, region=None, contained=True):
+        self._checkAttached()
+        store = self.geometryStore
+        indices = store.select(blockType, page, minConfidence, maxConfidence, region, contained)
+        return [self._blockMap[blockId] for blockId in store.idsAt(indices)]
+
+class ResponseStreamReader:
+
+    SHARED_VALUES = frozenset(('BlockType', 'Type', 'TextType', 'SelectionStatus', 'Id'))
+
+    def __init__(self, stream, chunkSize=65536):
+        self._stream = stream
+        self._chunkSize = chunkSize
+        self._decoder = json.JSONDecoder(object_pairs_hook=self._object)
+        self._strings = {}
+        self._textDecoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _object(self, pairs):
+        # Each block is decoded separately, so keys, enumerated values and ids are shared through one memo
+        share = self._strings.setdefault
+        values = self.SHARED_VALUES
+        obj = {}
+        for k, v in pairs:
+            if(k in values):
+                v = share(v, v)
+            elif(k == 'Ids'):
+                v = [share(i, i) for i in v]
+            obj[share(k, k)] = v
+        return obj
+
+    def _fill(self):
+        if(self._eof):
+            return False
+        chunk = self._stream.read(self._chunkSize)
+        if(isinstance(chunk, bytes)):
+            chunk = self._textDecoder.decode(chunk, final=not chunk)
+        if(not chunk):
+            self._eof = True
+            return False
+        if(self._pos):
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        self._buffer += chunk
+        return True
+
+    def _peek(self):
+        while(True):
+            while(self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\n\r"):
+                self._pos += 1
+            if(self._pos < len(self._buffer)):
+                return self._buffer[self._pos]
+            if(not self._fill()):
+                raise ValueError("Unexpected end of Textract response stream")
+
+    def _expect(self, chars):
+        c = self._peek()
+        if(c not in chars):
+            raise ValueError("Expected one of '{}' at offset {} but found '{}'".format(chars, self._pos, c))
+        self._pos += 1
+        return c
+
+    def _value(self):
+        self._peek()
+        while(True):
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                if(end < len(self._buffer) or self._eof):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if(self._eof):
+                    raise
+            self._fill()
+
+    def _readResponse(self, builder):
+        self._expect("{")
+        responsePage = {}
+        builder.startResponse(responsePage)
+        if(self._peek() == "}"):
+            self._pos += 1
+            return
+        while(True):
+            key = self._value()
+            self._expect(":")
+            if(key == "Blocks"):
+                self._expect("[")
+                if(self._peek() == "]"):
+                    self._pos += 1
+                else:
+                    while(True):
+                        page = builder.appendBlock(self._value())
+                        if(page):
+                            yield page
+                        if(self._expect(",]") == "]"):
+                            break
+            else:
+                responsePage[key] = self._value()
+            if(self._expect(",}") == "}"):
+                return
+
+    def readInto(self, builder):
+        if(self._peek() == "["):
+            self._pos += 1
+            if(self._peek() == "]"):
+                self._pos += 1
+            else:
+                while(True):
+                    for page in self._readResponse(builder):
+                        yield page
+                    if(self._expect(",]") == "]"):
+                        break
+        else:
+            for page in self._readResponse(builder):
+                yield page
+        for page in builder.finish():
+            yield page
+
+class DocumentBuilder:
+
+    def __init__(self, buildPages=True, stats=False, tracer=None, include=None, geometry="full"):
+        self._buildPages = buildPages
+        self._responsePages = []
+        self._responseDocumentPages = []
+        self._documentPage = None
+        self._blockMap = {}
+        self._relationships = RelationshipIndex()
+        self._stats = ParseStats(tracer) if (stats or tracer) else None
+        self._context = ParseContext(self._blockMap, self._stats, include, geometry)
+        self._pages = []
+        self._finished = False
+
+    def _addBlock(self, block):
+        if('BlockType' in block and 'Id' in block):
+            self._blockMap[block['Id']] = block
+            self._relationships.add(block)
+            if(self._stats is not None):
+                self._stats.countBlocks((block,))
+
+        closedPage = None
+        if(block['BlockType'] == 'PAGE'):
+            if(self._documentPage):
+                closedPage = self._closePage()
+            self._documentPage = []
+            self._documentPage.append(block)
+        else:
+            self._documentPage.append(block)
+        return closedPage
+
+    def _closePage(self):
+        documentPage = {"Blocks" : self._documentPage}
+        self._responseDocumentPages.append(documentPage)
+        self._documentPage = None
+        if(not self._buildPages):
+            return None
+        page = Page(documentPage["Blocks"], self._blockMap, self._context)
+        self._pages.append(page)
+        return page
+
+    def _checkNotFinished(self):
+        if(self._finished):
+            raise ValueError("DocumentBuilder is already finished")
+
+    def append(self, responsePage):
+        self._checkNotFinished()
+        self._responsePages.append(responsePage)
+        pages = []
+        for block in responsePage['Blocks']:
+            page = self._addBlock(block)
+            if(page):
+                pages.append(page)
+        return pages
+
+    def startResponse(self, responsePage):
+        self._checkNotFinished()
+        if('Blocks' not in responsePage):
+            responsePage['Blocks'] = []
+        self._responsePages.append(responsePage)
+
+    def appendBlock(self, block):
+        self._checkNotFinished()
+        if(not self._responsePages):
+            self.startResponse({})
+        self._responsePages[-1]['Blocks'].append(block)
+        return self._addBlock(block)
+
+    def finish(self):
+        pages = []
+        if(not self._finished):
+            self._finished = True
+            if(self._documentPage):
+                page = self._closePage()
+                if(page):
+                    pages.append(page)
+        return pages
+
+    def iterPages(self, responsePages):
+        for responsePage in responsePages:
+            for page in self.append(responsePage):
+                yield page
+        for page in self.finish():
+            yield page
+
+    def document(self):
+        self.finish()
+        pages = self._pages
+        if(not self._buildPages):
+            pages = PageList(self._responseDocumentPages, self._blockMap, self._context)
+        return Document._fromParsed(self._responsePages, self._responseDocumentPages, self._blockMap, self._context, pages,
+                                    self._relationships)
+
+    @property
+    def blocks(self):
+        return self._responsePages
+
+    @property
+    def pageBlocks(self):
+        return self._responseDocumentPages
+
+    @property
+    def blockMap(self):
+        return self._blockMap
+
+    @property
+    def relationships(self):
+        return self._relationships
+
+    @property
+    def pages(self):
+        return self._pages
+
+class LazySequence:
+
+    def __init__(self, count, factory):
+        self._factory = factory
+        self._items = [None] * count
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if(isinstance(index, slice)):
+            return [self[i] for i in range(*index.indices(len(self._items)))]
+        if(index < 0):
+            index += len(self._items)
+        if(index < 0 or index >= len(self._items)):
+            raise IndexError("index out of range")
+        item = self._items[index]
+        if(item is None):
+            item = self._factory(index)
+            self._items[index] = item
+        return item
+
+    def __iter__(self):
+        for i in range(len(self._items)):
+            yield self[i]
+
+class SnapshotBlockMap:
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def __len__(self):
+        return self._snapshot.blockCount
+
+    def __getitem__(self, blockId):
+        index = self._snapshot.indexOf(blockId)
+        if(index is None):
+            raise KeyError(blockId)
+        return self._snapshot.block(index)
+
+    def __contains__(self, blockId):
+        return self._snapshot.indexOf(blockId) is not None
+
+    def __iter__(self):
+        for i in range(self._snapshot.blockCount):
+            yield self._snapshot.blockId(i)
+
+    def get(self, blockId, default=None):
+        index = self._snapshot.indexOf(blockId)
+        if(index is None):
+            return default
+        return self._snapshot.block(index)
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        for i in range(self._snapshot.blockCount):
+            yield self._snapshot.block(i)
+
+    def items(self):
+        for i in range(self._snapshot.blockCount):
+            yield self._snapshot.blockId(i), self._snapshot.block(i)
+
+class DocumentSnapshot:
+
+    MAGIC = b'TRPSNAP\x00'
+    VERSION = 2
+    NONE = 0xFFFFFFFF
+
+    HAS_CONFIDENCE = 1
+    HAS_TEXT = 2
+    HAS_ROW_INDEX = 4
+    HAS_COLUMN_INDEX = 8
+    HAS_ROW_SPAN = 16
+    HAS_COLUMN_SPAN = 32
+    HAS_SELECTION_STATUS = 64
+    HAS_PAGE = 128
+    HAS_ENTITY_TYPES = 256
+    HAS_GEOMETRY = 512
+    HAS_RELATIONSHIPS = 1024
+    HAS_EXTRA = 2048
+
+    _INTEGER_KEYS = (('RowIndex', HAS_ROW_INDEX), ('ColumnIndex', HAS_COLUMN_INDEX),
+                     ('RowSpan', HAS_ROW_SPAN), ('ColumnSpan', HAS_COLUMN_SPAN), ('Page', HAS_PAGE))
+    _KNOWN_KEYS = frozenset(('BlockType', 'Id', 'Confidence', 'Text', 'RowIndex', 'ColumnIndex', 'RowSpan',
+                             'ColumnSpan', 'SelectionStatus', 'Page', 'EntityTypes', 'Geometry', 'Relationships'))
+
+    _SECTIONS = (('stringOffsets', 'I'), ('stringData', 'B'), ('blockIds', 'I'), ('blockTypes', 'I'),
+                 ('flags', 'I'), ('texts', 'I'), ('confidence', 'd'), ('integers', 'i'), ('selectionStatus', 'I'),
+                 ('boundingBoxes', 'd'), ('polygonOffsets', 'I'), ('polygonPoints', 'd'),
+                 ('relationshipOffsets', 'I'), ('relationshipTypes', 'I'), ('relationshipIdOffsets', 'I'),
+                 ('relationshipIds', 'I'), ('entityOffsets', 'I'), ('entityTypes', 'I'), ('extra', 'I'),
+                 ('pageStarts', 'I'), ('responseStarts', 'I'), ('responseMetadata', 'I'), ('profile', 'I'))
+
+    _HEADER = struct.Struct('<8sII')
+    _SECTION = struct.Struct('<QQ')
+
+    def __init__(self, filePath):
+        self._file = open(filePath, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        magic, version, sectionCount = self._HEADER.unpack_from(self._mmap, 0)
+        if(magic != self.MAGIC):
+            self.close()
+            raise ValueError("{} is not a trp document snapshot".format(filePath))
+        if(version != self.VERSION or sectionCount != len(self._SECTIONS)):
+            self.close()
+            raise ValueError("Unsupported trp document snapshot version {}".format(version))
+
+        view = memoryview(self._mmap)
+        self._views = [view]
+        position = self._HEADER.size
+        for name, typecode in self._SECTIONS:
+            offset, size = self._SECTION.unpack_from(self._mmap, position)
+            position += self._SECTION.size
+            section = view[offset:offset + size]
+            if(typecode != 'B'):
+                if(sys.byteorder == 'little'):
+                    section = section.cast(typecode)
+                else:
+                    values = array.array(typecode)
+                    values.frombytes(section)
+                    values.byteswap()
+                    section = values
+            self._views.append(section)
+            setattr(self, '_' + name, section)
+
+        self._blocks = [None] * len(self._blockIds)
+        self._indexes = None
+        self._strings = [None] * (len(self._stringOffsets) - 1)
+        self._extras = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def close(self):
+        if(self._mmap.closed):
+            return
+        self._blocks = None
+        self._indexes = None
+        self._strings = None
+        self._extras = None
+        for name, typecode in self._SECTIONS:
+            setattr(self, '_' + name, None)
+        for view in getattr(self, '_views', []):
+            if(isinstance(view, memoryview)):
+                view.release()
+        self._views = []
+        self._mmap.close()
+        self._file.close()
+
+    def _string(self, index):
+        if(index == self.NONE):
+            return None
+        value = self._strings[index]
+        if(value is None):
+            value = str(self._stringData[self._stringOffsets[index]:self._stringOffsets[index + 1]], 'utf-8')
+            self._strings[index] = value
+        return value
+
+    @property
+    def blockCount(self):
+        return len(self._blockIds)
+
+    @property
+    def pageCount(self):
+        return len(self._pageStarts) - 1
+
+    @property
+    def responseCount(self):
+        return len(self._responseStarts) - 1
+
+    def blockId(self, index):
+        return self._string(self._blockIds[index])
+
+    def indexOf(self, blockId):
+        if(self._indexes is None):
+            data = self._stringData.tobytes()
+            offsets = self._stringOffsets
+            self._indexes = dict((str(data[offsets[s]:offsets[s + 1]], 'utf-8'), i) for i, s in enumerate(self._blockIds))
+        return self._indexes.get(blockId)
+
+    def block(self, index):
+        block = self._blocks[index]
+        if(block is None):
+            block = self._decodeBlock(index)
+            self._blocks[index] = block
+        return block
+
+    def _decodeBlock(self, i):
+        flags = self._flags[i]
+        block = {'BlockType' : self._string(self._blockTypes[i])}
+        if(flags & self.HAS_CONFIDENCE):
+            block['Confidence'] = self._confidence[i]
+        if(flags & self.HAS_TEXT):
+            block['Text'] = self._string(self._texts[i])
+        for k, (key, flag) in enumerate(self._INTEGER_KEYS):
+            if(flags & flag):
+                block[key] = self._integers[i * len(self._INTEGER_KEYS) + k]
+        if(flags & self.HAS_SELECTION_STATUS):
+            block['SelectionStatus'] = self._string(self._selectionStatus[i])
+        if(flags & self.HAS_GEOMETRY):
+            bb = self._boundingBoxes[i * 4:i * 4 + 4]
+            points = self._polygonPoints[self._polygonOffsets[i] * 2:self._polygonOffsets[i + 1] * 2].tolist()
+            block['Geometry'] = {
+                'BoundingBox' : {'Width' : bb[0], 'Height' : bb[1], 'Left' : bb[2], 'Top' : bb[3]},
+                'Polygon' : [{'X' : x, 'Y' : y} for x, y in zip(points[0::2], points[1::2])]
+            }
+        block['Id'] = self._string(self._blockIds[i])
+        if(flags & self.HAS_RELATIONSHIPS):
+            relationships = []
+            for g in range(self._relationshipOffsets[i], self._relationshipOffsets[i + 1]):
+                ids = self._relationshipIds[self._relationshipIdOffsets[g]:self._relationshipIdOffsets[g + 1]]
+                relationships.append({'Type' : self._string(self._relationshipTypes[g]),
+                                      'Ids' : [self._string(s) for s in ids]})
+            block['Relationships'] = relationships
+        if(flags & self.HAS_ENTITY_TYPES):
+            entities = self._entityTypes[self._entityOffsets[i]:self._entityOffsets[i + 1]]
+            block['EntityTypes'] = [self._string(s) for s in entities]
+        if(flags & self.HAS_EXTRA):
+            extra = self._extras.get(self._extra[i])
+            if(extra is None):
+                extra = json.loads(self._string(self._extra[i]))
+                # Only flat extras are reused; nested values must not be shared between blocks
+                if(all(v is None or isinstance(v, (str, int, float)) for v in extra.values())):
+                    self._extras[self._extra[i]] = extra
+            block.update(extra)
+        return block
+
+    def _pageBlocks(self, index):
+        return {"Blocks" : [self.block(i) for i in range(self._pageStarts[index], self._pageStarts[index + 1])]}
+
+    def _responsePage(self, index):
+        responsePage = json.loads(self._string(self._responseMetadata[index]))
+        responsePage['Blocks'] = [self.block(i) for i in range(self._responseStarts[index], self._responseStarts[index + 1])]
+        return responsePage
+
+    def document(self):
+        blockMap = SnapshotBlockMap(self)
+        profile = json.loads(self._string(self._profile[0]))
+        context = ParseContext(blockMap, None, profile['include'], profile['geometry'])
+        documentPages = LazySequence(self.pageCount, self._pageBlocks)
+        responsePages = LazySequence(self.responseCount, self._responsePage)
+        pages = PageList(documentPages, blockMap, context)
+        document = Document._fromParsed(responsePages, documentPages, blockMap, context, pages)
+        document._snapshot = self
+        return document
+
+    @classmethod
+    def write(cls, document, filePath):
+        strings = {}
+        stringOffsets = array.array('I', [0])
+        stringData = bytearray()
+
+        def intern(value):
+            index = strings.get(value)
+            if(index is None):
+                index = len(strings)
+                strings[value] = index
+                stringData.extend(value.encode('utf-8'))
+                stringOffsets.append(len(stringData))
+            return index
+
+        sections = dict((name, array.array(typecode)) for name, typecode in cls._SECTIONS if typecode != 'B')
+        sections['polygonOffsets'].append(0)
+        sections['relationshipOffsets'].append(0)
+        sections['relationshipIdOffsets'].append(0)
+        sections['entityOffsets'].append(0)
+        sections['pageStarts'].append(0)
+        sections['responseStarts'].append(0)
+
+        blockCount = 0
+        for documentPage in document.pageBlocks:
+            for block in documentPage["Blocks"]:
+                cls._writeBlock(block, sections, intern)
+                blockCount += 1
+            sections['pageStarts'].append(blockCount)
+
+        responseBlocks = 0
+        for responsePage in document.blocks:
+            responseBlocks += len(responsePage['Blocks'])
+            sections['responseStarts'].append(responseBlocks)
+            metadata = dict((k, v) for k, v in responsePage.items() if k != 'Blocks')
+            sections['responseMetadata'].append(intern(json.dumps(metadata)))
+        if(responseBlocks != blockCount):
+            raise ValueError("Response blocks do not match the document page split")
+
+        include = document._context.include
+        profile = {'include' : sorted(include) if include is not None else None, 'geometry' : document._context.geometryMode}
+        sections['profile'].append(intern(json.dumps(profile)))
+        sections['stringOffsets'] = stringOffsets
+        sections['stringData'] = stringData
+
+        payloads = []
+        for name, typecode in cls._SECTIONS:
+            values = sections[name]
+            if(typecode != 'B' and sys.byteorder != 'little'):
+                values = array.array(typecode, values)
+                values.byteswap()
+            payloads.append(bytes(values) if typecode == 'B' else values.tobytes())
+
+        position = cls._HEADER.size + cls._SECTION.size * len(payloads)
+        table = []
+        for payload in payloads:
+            position += (-position) % 8
+            table.append((position, len(payload)))
+            position += len(payload)
+
+        with open(filePath, 'wb') as fp:
+            fp.write(cls._HEADER.pack(cls.MAGIC, cls.VERSION, len(payloads)))
+            for offset, size in table:
+                fp.write(cls._SECTION.pack(offset, size))
+            written = cls._HEADER.size + cls._SECTION.size * len(payloads)
+            for (offset, size), payload in zip(table, payloads):
+                fp.write(b'\x00' * (offset - written))
+                fp.write(payload)
+                written = offset + size
+
+    @classmethod
+    def _writeBlock(cls, block, sections, intern):
+        flags = 0
+        sections['blockIds'].append(intern(block['Id']))
+        sections['blockTypes'].append(intern(block['BlockType']))
+
+        if('Confidence' in block):
+            flags |= cls.HAS_CONFIDENCE
+        sections['confidence'].append(block.get('Confidence', 0.0))
+
+        if('Text' in block):
+            flags |= cls.HAS_TEXT
+            sections['texts'].append(intern(block['Text']))
+        else:
+            sections['texts'].append(cls.NONE)
+
+        for key, flag in cls._INTEGER_KEYS:
+            if(key in block):
+                flags |= flag
+            sections['integers'].append(block.get(key, 0))
+
+        if('SelectionStatus' in block):
+            flags |= cls.HAS_SELECTION_STATUS
+            sections['selectionStatus'].append(intern(block['SelectionStatus']))
+        else:
+            sections['selectionStatus'].append(cls.NONE)
+
+        if('Geometry' in block):
+            flags |= cls.HAS_GEOMETRY
+            bb = block['Geometry']['BoundingBox']
+            sections['boundingBoxes'].extend((bb['Width'], bb['Height'], bb['Left'], bb['Top']))
+            for pg in block['Geometry'].get('Polygon', []):
+                sections['polygonPoints'].extend((pg['X'], pg['Y']))
+        else:
+            sections['boundingBoxes'].extend((0.0, 0.0, 0.0, 0.0))
+        sections['polygonOffsets'].append(len(sections['polygonPoints']) // 2)
+
+        if('Relationships' in block):
+            flags |= cls.HAS_RELATIONSHIPS
+            for rs in block['Relationships']:
+                sections['relationshipTypes'].append(intern(rs['Type']))
+                sections['relationshipIds'].extend(intern(rid) for rid in rs['Ids'])
+                sections['relationshipIdOffsets'].append(len(sections['relationshipIds']))
+        sections['relationshipOffsets'].append(len(sections['relationshipTypes']))
+
+        if('EntityTypes' in block):
+            flags |= cls.HAS_ENTITY_TYPES
+            sections['entityTypes'].extend(intern(e) for e in block['EntityTypes'])
+        sections['entityOffsets'].append(len(sections['entityTypes']))
+
+        extra = dict((k, v) for k, v in block.items() if k not in cls._KNOWN_KEYS)
+        if(extra):
+            flags |= cls.HAS_EXTRA
+            sections['extra'].append(intern(json.dumps(extra)))
+        else:
+            sections['extra'].append(cls.NONE)
+
+        sections['flags'].append(flags)
+
+class DocumentCache:
+
+    def __init__(self, maxBytes=512 * 1024 * 1024, bytesPerBlock=3000):
+        self._maxBytes = maxBytes
+        self._bytesPerBlock = bytesPerBlock
+        self._entries = collections.OrderedDict()
+        self._currentBytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @staticmethod
+    def responseKey(responsePages):
+        if(not isinstance(responsePages, list)):
+            responsePages = [responsePages]
+        h = hashlib.blake2b(digest_size=16)
+        for responsePage in responsePages:
+            blocks = responsePage.get('Blocks', [])
+            parts = [str(len(blocks))]
+            for block in blocks:
+                parts.append(block.get('Id', ''))
+                parts.append(block.get('Text', ''))
+                parts.append(repr(block.get('Confidence')))
+                parts.append(block.get('SelectionStatus', ''))
+                parts.append(','.join(block.get('EntityTypes', ())))
+                for rs in block.get('Relationships') or ():
+                    parts.append(rs['Type'])
+                    parts.extend(rs['Ids'])
+                parts.append('\x01')
+            h.update('\x00'.join(parts).encode('utf-8'))
+            h.update(b'\x02')
+        return h.hexdigest()
+
+    @staticmethod
+    def jobKey(jobId, nextTokens=None):
+        h = hashlib.blake2b(digest_size=16)
+        h.update(jobId.encode('utf-8'))
+        for token in (nextTokens or []):
+            h.update(b'\x00')
+            h.update((token or '').encode('utf-8'))
+        return h.hexdigest()
+
+    @staticmethod
+    def _optionsKey(options):
+        items = []
+        for name, value in sorted(options.items()):
+            if(isinstance(value, (set, frozenset, list, tuple))):
+                value = tuple(sorted(value))
+            items.append((name, value))
+        return tuple(items)
+
+    def estimateSize(self, document):
+        return document.blockCount * self._bytesPerBlock
+
+    def lookup(self, key):
+        with self._lock:
+            document = self._entries.get(key)
+            if(document is None):
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return document[0]
+
+    def put(self, key, document):
+        size = self.estimateSize(document)
+        with self._lock:
+            if(key in self._entries):
+                self._currentBytes -= self._entries.pop(key)[1]
+            if(size > self._maxBytes):
+                return document
+            document._shared = True
+            self._entries[key] = (document, size)
+            self._currentBytes += size
+            while(self._currentBytes > self._maxBytes):
+                evictedKey, (evicted, evictedSize) = self._entries.popitem(last=False)
+                self._currentBytes -= evictedSize
+                self._evictions += 1
+        return document
+
+    def get(self, responsePages, key=None, **options):
+        if(key is None):
+            key = self.responseKey(responsePages)
+        if(options):
+            key = (key, self._optionsKey(options))
+        document = self.lookup(key)
+        if(document is None):
+            document = self.put(key, Document(responsePages, **options))
+        return document
+
+    def remove(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if(entry):
+                self._currentBytes -= entry[1]
+            return entry is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._currentBytes = 0
+
+    @property
+    def maxBytes(self):
+        return self._maxBytes
+
+    @property
+    def currentBytes(self):
+        return self._currentBytes
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    @property
+    def evictions(self):
+        return self._evictions
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {"entries" : len(self._entries), "bytes" : self._currentBytes, "maxBytes" : self._maxBytes,
+                    "hits" : self._hits, "misses" : self._misses, "evictions" : self._evictions}
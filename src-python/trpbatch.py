@@ -0,0 +1,223 @@
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from trp import Document
+
+class BatchResult:
+    __slots__ = ('_path', '_data', '_error', '_seconds')
+
+    def __init__(self, path, data=None, error=None, seconds=0.0):
+        self._path = path
+        self._data = data
+        self._error = error
+        self._seconds = seconds
+
+    def __str__(self):
+        if(self._error):
+            return "{}: ERROR {}".format(self._path, self._error.splitlines()[-1])
+        return "{}: {} pages in {:.3f}s".format(self._path, len(self._data["pages"]), self._seconds)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def data(self):
+        return self._data
+
+    @property
+    def error(self):
+        return self._error
+
+    @property
+    def seconds(self):
+        return self._seconds
+
+    @property
+    def ok(self):
+        return self._error is None
+
+class BatchStats:
+
+    def __init__(self):
+        self._started = time.time()
+        self._finished = None
+        self._latencies = []
+        self._failed = 0
+        self._pages = 0
+
+    def add(self, result):
+        self._latencies.append(result.seconds)
+        if(result.ok):
+            self._pages += len(result.data["pages"])
+        else:
+            self._failed += 1
+
+    def finish(self):
+        self._finished = time.time()
+
+    def _percentile(self, latencies, p):
+        if(not latencies):
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(round(p / 100.0 * (len(latencies) - 1))))]
+
+    def summary(self):
+        elapsed = (self._finished or time.time()) - self._started
+        latencies = sorted(self._latencies)
+        files = len(latencies)
+        return {
+            "files" : files,
+            "succeeded" : files - self._failed,
+            "failed" : self._failed,
+            "pages" : self._pages,
+            "seconds" : elapsed,
+            "filesPerSecond" : files / elapsed if elapsed else 0.0,
+            "pagesPerSecond" : self._pages / elapsed if elapsed else 0.0,
+            "latencyP50" : self._percentile(latencies, 50),
+            "latencyP95" : self._percentile(latencies, 95),
+            "latencyMax" : latencies[-1] if latencies else 0.0
+        }
+
+    def __str__(self):
+        s = self.summary()
+        return ("Files: {files} ({succeeded} ok, {failed} failed), pages: {pages}, time: {seconds:.2f}s\n"
+                "Throughput: {filesPerSecond:.1f} files/s, {pagesPerSecond:.1f} pages/s\n"
+                "Latency: p50 {latencyP50:.3f}s, p95 {latencyP95:.3f}s, max {latencyMax:.3f}s").format(**s)
+
+def iterPaths(inputs, extension=".json"):
+    for item in inputs:
+        if(os.path.isdir(item)):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if(name.endswith(extension)):
+                        yield os.path.join(root, name)
+        elif(item.startswith("@")):
+            with open(item[1:], 'r') as manifest:
+                base = os.path.dirname(item[1:])
+                for line in manifest:
+                    line = line.strip()
+                    if(line and not line.startswith("#")):
+                        yield os.path.join(base, line)
+        else:
+            yield item
+
+def extractDocument(doc):
+    pages = []
+    for page in doc.pages:
+        lines = [{"text" : line.text, "confidence" : line.confidence} for line in page.lines]
+        fields = []
+        for field in page.form.fields:
+            fields.append({
+                "key" : field.key.text if field.key else "",
+                "value" : field.value.text if field.value else "",
+                "confidence" : field.key.confidence if field.key else None
+            })
+        tables = []
+        for table in page.tables:
+            tables.append([[cell.text.strip() for cell in row.cells] for row in table.rows])
+        pages.append({"lines" : lines, "fields" : fields, "tables" : tables})
+    return {"pages" : pages}
+
+def parseFile(path, extract=extractDocument):
+    started = time.time()
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            doc = Document.fromFile(path)
+            data = extract(doc)
+        return BatchResult(path, data=data, seconds=time.time() - started)
+    except Exception:
+        return BatchResult(path, error=traceback.format_exc(), seconds=time.time() - started)
+
+def parseMany(paths, workers=None, maxInFlight=None, extract=extractDocument):
+    if(workers is not None and workers <= 1):
+        for path in paths:
+            yield parseFile(path, extract)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    limit = maxInFlight or (workers * 2)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for path in paths:
+            if(len(pending) >= limit):
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(executor.submit(parseFile, path, extract))
+        while(pending):
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+class JsonlWriter:
+
+    def __init__(self, fp):
+        self._fp = fp
+
+    def write(self, result):
+        record = {"path" : result.path, "seconds" : result.seconds}
+        if(result.ok):
+            record.update(result.data)
+        else:
+            record["error"] = result.error
+        self._fp.write(json.dumps(record) + "\n")
+
+class CsvWriter:
+
+    COLUMNS = ["path", "page", "type", "table", "row", "column", "key", "text", "confidence"]
+
+    def __init__(self, fp):
+        self._writer = csv.writer(fp)
+        self._writer.writerow(self.COLUMNS)
+
+    def write(self, result):
+        if(not result.ok):
+            self._writer.writerow([result.path, "", "ERROR", "", "", "", "", result.error.splitlines()[-1], ""])
+            return
+        for p, page in enumerate(result.data["pages"], 1):
+            for line in page["lines"]:
+                self._writer.writerow([result.path, p, "LINE", "", "", "", "", line["text"], line["confidence"]])
+            for field in page["fields"]:
+                self._writer.writerow([result.path, p, "FIELD", "", "", "", field["key"], field["value"], field["confidence"]])
+            for t, table in enumerate(page["tables"]):
+                for r, row in enumerate(table):
+                    for c, text in enumerate(row):
+                        self._writer.writerow([result.path, p, "CELL", t, r, c, "", text, ""])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse Textract JSON responses in parallel.")
+    parser.add_argument("inputs", nargs="+", help="Response files, directories, or @manifest files listing one path per line")
+    parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    parser.add_argument("-f", "--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count, 1 to run inline)")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Maximum files queued at once (default: 2 x workers)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not print statistics to stderr")
+    args = parser.parse_args(argv)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    try:
+        writer = CsvWriter(output) if args.format == "csv" else JsonlWriter(output)
+        stats = BatchStats()
+        for result in parseMany(iterPaths(args.inputs), workers=args.workers, maxInFlight=args.max_in_flight):
+            stats.add(result)
+            writer.write(result)
+            if(not result.ok and not args.quiet):
+                print(str(result), file=sys.stderr)
+        stats.finish()
+    finally:
+        if(output is not sys.stdout):
+            output.close()
+
+    if(not args.quiet):
+        print(str(stats), file=sys.stderr)
+    return 1 if stats.summary()["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from trp import Document
+from trpgenerator import generateResponse
+
+def benchConstruct(response, doc):
+    Document(response)
+
+def benchReadingOrder(response, doc):
+    for page in doc.pages:
+        page.getTextInReadingOrder()
+
+def benchSearchFields(response, doc):
+    for page in doc.pages:
+        page.form.searchFieldsByKey("address")
+        page.form.getFieldByKey("Phone Number:")
+
+def benchTables(response, doc):
+    n = 0
+    for page in doc.pages:
+        for table in page.tables:
+            for row in table.rows:
+                for cell in row.cells:
+                    n += len(cell.text)
+    return n
+
+CASES = [
+    ("construct", benchConstruct),
+    ("readingOrder", benchReadingOrder),
+    ("searchFields", benchSearchFields),
+    ("tables", benchTables),
+]
+
+def measure(case, response, repeat):
+    best = None
+    peak = 0
+    for i in range(repeat + 1):
+        doc = None if case is benchConstruct else Document(response)
+        gc.collect()
+        if(i == repeat):
+            tracemalloc.start()
+            case(response, doc)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            started = time.perf_counter()
+            case(response, doc)
+            elapsed = time.perf_counter() - started
+            if(best is None or elapsed < best):
+                best = elapsed
+    return best, peak
+
+def runBenchmarks(pageCounts, repeat=3, cases=None):
+    results = []
+    for pages in pageCounts:
+        response = generateResponse(pages)
+        for name, case in CASES:
+            if(cases and name not in cases):
+                continue
+            seconds, peak = measure(case, response, repeat)
+            results.append({"case" : name, "pages" : pages, "seconds" : seconds, "peakBytes" : peak})
+        del response
+    return results
+
+def compare(results, baseline, threshold):
+    previous = dict(((r["case"], r["pages"]), r) for r in baseline)
+    regressions = []
+    for r in results:
+        old = previous.get((r["case"], r["pages"]))
+        if(not old):
+            continue
+        for metric in ("seconds", "peakBytes"):
+            if(old[metric] and r[metric] > old[metric] * (1 + threshold)):
+                regressions.append("{} @ {} pages: {} {:.4g} -> {:.4g}".format(r["case"], r["pages"], metric, old[metric], r[metric]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark trp parsing on synthetic Textract responses.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--case", action="append", dest="cases", help="Run only the named case (repeatable)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against results previously written with --output")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    results = runBenchmarks(args.pages, args.repeat, args.cases)
+    print("{:<14}{:>8}{:>14}{:>14}".format("case", "pages", "seconds", "peak MB"))
+    for r in results:
+        print("{:<14}{:>8}{:>14.4f}{:>14.2f}".format(r["case"], r["pages"], r["seconds"], r["peakBytes"] / 1048576.0))
+
+    if(args.output):
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+    if(args.baseline):
+        with open(args.baseline, "r") as fp:
+            regressions = compare(results, json.load(fp), args.threshold)
+        for regression in regressions:
+            print("REGRESSION: " + regression)
+        if(regressions):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
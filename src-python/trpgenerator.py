@@ -0,0 +1,185 @@
+import json
+import random
+import sys
+import uuid
+
+WORDS = ["account", "amount", "balance", "bank", "date", "deposit", "due", "fee", "interest", "invoice",
+         "loan", "name", "number", "payment", "period", "principal", "rate", "statement", "tax", "total",
+         "address", "city", "county", "escrow", "insurance", "lender", "mortgage", "property", "state", "zip"]
+
+FIELD_KEYS = ["Full Name:", "Phone Number:", "Home Address:", "Mailing Address:", "Account Number:",
+              "Date of Birth:", "Loan Amount:", "Interest Rate:", "Employer Name:", "Email:"]
+
+class ResponseGenerator:
+
+    def __init__(self, linesPerPage=30, wordsPerLine=5, tablesPerPage=1, tableRows=5, tableColumns=4,
+                 spanProbability=0.1, fieldsPerPage=8, selectionElementsPerPage=2, blocksPerResponse=1000, seed=0):
+        self._linesPerPage = linesPerPage
+        self._wordsPerLine = wordsPerLine
+        self._tablesPerPage = tablesPerPage
+        self._tableRows = tableRows
+        self._tableColumns = tableColumns
+        self._spanProbability = spanProbability
+        self._fieldsPerPage = fieldsPerPage
+        self._selectionElementsPerPage = selectionElementsPerPage
+        self._blocksPerResponse = blocksPerResponse
+        self._random = random.Random(seed)
+
+    def _id(self):
+        return str(uuid.UUID(int=self._random.getrandbits(128), version=4))
+
+    def _confidence(self):
+        return self._random.uniform(50.0, 100.0)
+
+    def _geometry(self, left, top, width, height):
+        return {
+            "BoundingBox" : {"Width" : width, "Height" : height, "Left" : left, "Top" : top},
+            "Polygon" : [{"X" : left, "Y" : top}, {"X" : left + width, "Y" : top},
+                         {"X" : left + width, "Y" : top + height}, {"X" : left, "Y" : top + height}]
+        }
+
+    def _block(self, blockType, page, left, top, width, height, **attributes):
+        block = {"BlockType" : blockType, "Confidence" : self._confidence(),
+                 "Geometry" : self._geometry(left, top, width, height), "Id" : self._id(), "Page" : page}
+        block.update(attributes)
+        return block
+
+    def _words(self, texts, page, left, top, width, height, blocks):
+        words = []
+        wordWidth = width / max(1, len(texts))
+        for i, text in enumerate(texts):
+            word = self._block("WORD", page, left + i * wordWidth, top, wordWidth * 0.9, height,
+                               Text=text, TextType="PRINTED")
+            blocks.append(word)
+            words.append(word)
+        return words
+
+    def _line(self, texts, page, left, top, width, height, blocks):
+        line = self._block("LINE", page, left, top, width, height, Text=" ".join(texts))
+        blocks.append(line)
+        words = self._words(texts, page, left, top, width, height, blocks)
+        line["Relationships"] = [{"Type" : "CHILD", "Ids" : [w["Id"] for w in words]}]
+        return line, words
+
+    def _table(self, page, top, height, blocks):
+        rows = self._tableRows
+        columns = self._tableColumns
+        cellWidth = 0.9 / columns
+        cellHeight = height / rows
+        table = self._block("TABLE", page, 0.05, top, 0.9, height)
+        blocks.append(table)
+        covered = set()
+        cells = []
+        for r in range(1, rows + 1):
+            for c in range(1, columns + 1):
+                if((r, c) in covered):
+                    continue
+                rowSpan = 1
+                columnSpan = 1
+                if(self._random.random() < self._spanProbability):
+                    if(c < columns and (r, c + 1) not in covered):
+                        columnSpan = 2
+                    elif(r < rows):
+                        rowSpan = 2
+                for dr in range(rowSpan):
+                    for dc in range(columnSpan):
+                        covered.add((r + dr, c + dc))
+                left = 0.05 + (c - 1) * cellWidth
+                cellTop = top + (r - 1) * cellHeight
+                cell = self._block("CELL", page, left, cellTop, cellWidth * columnSpan, cellHeight * rowSpan,
+                                   RowIndex=r, ColumnIndex=c, RowSpan=rowSpan, ColumnSpan=columnSpan)
+                blocks.append(cell)
+                if(r > 1 and self._random.random() < 0.1):
+                    children = [self._block("SELECTION_ELEMENT", page, left, cellTop, 0.01, 0.01,
+                                            SelectionStatus=self._random.choice(["SELECTED", "NOT_SELECTED"]))]
+                    blocks.append(children[0])
+                else:
+                    texts = [self._random.choice(WORDS) for i in range(self._random.randint(1, 2))]
+                    if(r > 1 and c > 1):
+                        texts = ["{:.2f}".format(self._random.uniform(0, 10000))]
+                    children = self._words(texts, page, left, cellTop, cellWidth * columnSpan, cellHeight * 0.8, blocks)
+                cell["Relationships"] = [{"Type" : "CHILD", "Ids" : [b["Id"] for b in children]}]
+                cells.append(cell)
+        table["Relationships"] = [{"Type" : "CHILD", "Ids" : [c["Id"] for c in cells]}]
+        return table
+
+    def _field(self, key, page, top, height, blocks):
+        keyBlock = self._block("KEY_VALUE_SET", page, 0.05, top, 0.2, height, EntityTypes=["KEY"])
+        valueBlock = self._block("KEY_VALUE_SET", page, 0.3, top, 0.3, height, EntityTypes=["VALUE"])
+        blocks.extend([keyBlock, valueBlock])
+        keyWords = self._words(key.split(), page, 0.05, top, 0.2, height, blocks)
+        if(self._random.random() < 0.2):
+            value = [self._block("SELECTION_ELEMENT", page, 0.3, top, 0.01, height,
+                                 SelectionStatus=self._random.choice(["SELECTED", "NOT_SELECTED"]))]
+            blocks.append(value[0])
+        else:
+            texts = [self._random.choice(WORDS) for i in range(self._random.randint(1, 4))]
+            value = self._words(texts, page, 0.3, top, 0.3, height, blocks)
+        keyBlock["Relationships"] = [{"Type" : "VALUE", "Ids" : [valueBlock["Id"]]},
+                                     {"Type" : "CHILD", "Ids" : [w["Id"] for w in keyWords]}]
+        valueBlock["Relationships"] = [{"Type" : "CHILD", "Ids" : [b["Id"] for b in value]}]
+
+    def _page(self, number):
+        blocks = []
+        page = {"BlockType" : "PAGE", "Geometry" : self._geometry(0.0, 0.0, 1.0, 1.0), "Id" : self._id(), "Page" : number}
+        blocks.append(page)
+
+        sections = self._tablesPerPage + 2
+        lineHeight = 0.9 / max(1, self._linesPerPage + self._fieldsPerPage + sections * 4)
+        top = 0.05
+        lines = []
+        for i in range(self._fieldsPerPage):
+            self._field(FIELD_KEYS[i % len(FIELD_KEYS)], number, top, lineHeight * 0.8, blocks)
+            top += lineHeight
+        for t in range(self._tablesPerPage + 1):
+            for i in range(self._linesPerPage // (self._tablesPerPage + 1)):
+                texts = [self._random.choice(WORDS) for w in range(self._wordsPerLine)]
+                column = i % 2
+                line, words = self._line(texts, number, 0.05 + column * 0.5, top, 0.4, lineHeight * 0.8, blocks)
+                lines.append(line)
+                if(column):
+                    top += lineHeight
+            top += lineHeight
+            if(t < self._tablesPerPage):
+                self._table(number, top, lineHeight * 3, blocks)
+                top += lineHeight * 4
+        for i in range(self._selectionElementsPerPage):
+            blocks.append(self._block("SELECTION_ELEMENT", number, 0.9, 0.05 + i * 0.02, 0.01, 0.01,
+                                      SelectionStatus=self._random.choice(["SELECTED", "NOT_SELECTED"])))
+
+        page["Relationships"] = [{"Type" : "CHILD", "Ids" : [b["Id"] for b in blocks[1:] if b["BlockType"] in ("LINE", "TABLE", "KEY_VALUE_SET")]}]
+        return blocks
+
+    def iterBlocks(self, pages):
+        for number in range(1, pages + 1):
+            for block in self._page(number):
+                yield block
+
+    def generate(self, pages=1):
+        responses = []
+        chunk = []
+        for block in self.iterBlocks(pages):
+            chunk.append(block)
+            if(len(chunk) >= self._blocksPerResponse):
+                responses.append(chunk)
+                chunk = []
+        if(chunk or not responses):
+            responses.append(chunk)
+
+        result = []
+        for i, blocks in enumerate(responses):
+            response = {"DocumentMetadata" : {"Pages" : pages}, "JobStatus" : "SUCCEEDED", "Blocks" : blocks}
+            if(i < len(responses) - 1):
+                response["NextToken"] = self._id()
+            result.append(response)
+        return result
+
+def generateResponse(pages=1, **options):
+    return ResponseGenerator(**options).generate(pages)
+
+def run():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    json.dump(generateResponse(pages), sys.stdout)
+
+if __name__ == "__main__":
+    run()
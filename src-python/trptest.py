@@ -1,4 +1,7 @@
+import io
 import json
+import os
+import tempfile
 from trp import Document
 
 def processDocument(doc):
@@ -40,8 +43,63 @@ def processDocument(doc):
         for field in fields:
             print("Field: Key: {}, Value: {}".format(field.key, field.value))
 
+    #Search document text
+    for phrase in ["Any Town", "any street"]:
+        print("\nSearch text ({}):\n====================".format(phrase))
+        hits = doc.searchText(phrase)
+        assert hits, "no text hits for " + phrase
+        for hit in hits:
+            print("Page {}: {}".format(hit.pageNumber, hit.text))
+
     return "Test" 
 
+def checkReadingOrder(doc):
+    #Table columns on the first page are read one at a time, below the form lines that span them
+    expected = ["Applicant iInformation", "Full Name: Jane Doe", "Phone Number: 555-0100",
+                "Home Address: 123 Any Street. Any Town. USA", "Mailing Address: same as home address",
+                "Previous Employment History",
+                "Start Date", "1/15/2009", "8/15/2013",
+                "End Date", "6/30/2013", "present",
+                "Employer Name", "Any Company", "Example Corp.",
+                "Position Held", "Head Baker", "Baker",
+                "Reason for leaving", "Family relocated", "N/A, current", "employer"]
+    print("\nReading order:\n====================")
+    lines = doc.pages[0].getLinesInReadingOrder()
+    for column, text in lines:
+        print("Column {}: {}".format(column, text))
+    assert [text for column, text in lines] == expected, "unexpected reading order"
+    assert [column for column, text in lines] == [0] * 9 + [1] * 3 + [2] * 3 + [3] * 3 + [4] * 4, "unexpected reading order columns"
+
+def checkStreaming(filePath, doc):
+    #Streamed parsing must build the same document as json.load
+    expected = str(doc)
+    with open(filePath, 'rb') as document:
+        data = document.read()
+    response = json.loads(data)
+    assert str(Document.fromFile(filePath)) == expected, "fromFile differs"
+    assert str(Document.fromStream(io.BytesIO(data))) == expected, "fromStream(bytes) differs"
+    assert str(Document.fromStream(io.StringIO(data.decode('utf-8')))) == expected, "fromStream(str) differs"
+    single = json.dumps(response[0]).encode('utf-8')
+    assert str(Document.fromStream(io.BytesIO(single))) == str(Document(response[0])), "fromStream(single bytes) differs"
+    assert str(Document.fromStream(io.StringIO(single.decode('utf-8')))) == str(Document(response[0])), "fromStream(single str) differs"
+    print("\nStreaming matches json.load")
+
+def checkSnapshot(doc):
+    #A saved and reloaded document must print the same as the original
+    fd, snapshotPath = tempfile.mkstemp(suffix=".trp")
+    os.close(fd)
+    try:
+        doc.save(snapshotPath)
+        with Document.load(snapshotPath) as loaded:
+            assert str(loaded) == str(doc), "snapshot round trip differs"
+        partial = Document(doc.blocks, include=["LINES"], geometry="bbox")
+        partial.save(snapshotPath)
+        with Document.load(snapshotPath) as loaded:
+            assert str(loaded) == str(partial), "snapshot round trip loses the parse options"
+    finally:
+        os.remove(snapshotPath)
+    print("\nSnapshot matches the parsed document")
+
 def run():
     response = {}
     
@@ -51,6 +109,9 @@ def run():
 
     doc = Document(response)
     result = processDocument(doc)
+    checkReadingOrder(doc)
+    checkStreaming(filePath, doc)
+    checkSnapshot(doc)
     print(result)
 
 run()
\ No newline at end of file